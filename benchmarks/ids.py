@@ -0,0 +1,94 @@
+"""Benchmark IDGenerator and check IDs never collide across worker processes.
+
+    python -m benchmarks.ids [processes] [ids per process]
+
+Each process gets its worker ID the way main.py does, from a WorkerLease on the
+Postgres database in DB_DSN, pinned to WORKER_ID if that is set. The collision
+check is skipped without DB_DSN.
+"""
+
+from os import getenv
+from sys import argv
+from asyncio import run
+from timeit import timeit
+from multiprocessing import Barrier, Pool
+
+from dotenv import load_dotenv
+
+from src.utils.ids import IDGenerator, decode_sf
+from src.utils.lease import WorkerLease
+from src.utils.database import Database
+
+
+barrier: Barrier = None
+
+
+def share(shared: Barrier) -> None:
+    global barrier
+    barrier = shared
+
+
+async def generate_async(count: int) -> list:
+    db = Database()
+    ids = IDGenerator()
+    lease = WorkerLease.from_env(db, ids)
+
+    try:
+        await lease.start()
+        barrier.wait()
+
+        half = count // 2
+        generated = [ids.next() for _ in range(half)] + ids.next_many(count - half)
+
+        assert generated == sorted(generated), f"worker {ids.worker} went backwards"
+        assert all(decode_sf(id)[1] == ids.worker for id in generated)
+
+        # Every process holds its ID until all of them are done, as running servers would.
+        barrier.wait()
+
+        return generated
+    except BaseException:
+        # Don't leave the other processes waiting on one that failed.
+        barrier.abort()
+        raise
+    finally:
+        await lease.stop()
+        await db.close()
+
+
+def generate(count: int) -> list:
+    return run(generate_async(count))
+
+
+def benchmark() -> None:
+    ids = IDGenerator(0)
+
+    for name, stmt, n in (
+        ("next()", ids.next, 200_000),
+        ("next_many(1000)", lambda: ids.next_many(1000), 200),
+    ):
+        total = timeit(stmt, number=n)
+        per_id = total / (n * (1000 if "many" in name else 1))
+        print(f"{name:>16}: {per_id * 1e9:8.1f}ns/id, {1 / per_id:12,.0f} ids/s")
+
+
+def stress(processes: int, count: int) -> None:
+    with Pool(processes, share, (Barrier(processes),)) as pool:
+        results = pool.map(generate, [count] * processes)
+
+    generated = [id for ids in results for id in ids]
+    unique = len(set(generated))
+
+    print(f"{processes} processes generated {len(generated):,} IDs, {len(generated) - unique} collisions")
+
+    assert unique == len(generated)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    benchmark()
+
+    if getenv("DB_DSN"):
+        stress(int(argv[1]) if len(argv) > 1 else 8, int(argv[2]) if len(argv) > 2 else 100_000)
+    else:
+        print("DB_DSN is not set, skipping the collision check.")
@@ -0,0 +1,270 @@
+"""Load test the hot routes of a running copy of main:app.
+
+    python -m benchmarks.load --seed --concurrency 32 --duration 30
+
+Boots uvicorn against the Postgres database in DB_DSN, which must already have the
+migrations in src/data applied. --seed first fills it with synthetic users,
+sessions and Moots. Results are written as JSON, by default to
+benchmarks/results/<commit>.json, and --compare prints the change against an
+earlier result file.
+
+Per user rate limits are lifted unless --rate-limits is passed, and 429s are
+counted apart from errors either way.
+"""
+
+from os import environ, getenv
+from json import dump, load
+from time import perf_counter
+from random import Random
+from secrets import token_hex
+from subprocess import Popen, check_output
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from asyncio import gather, run, sleep
+from collections import defaultdict
+from typing import Dict, List
+
+from aiohttp import ClientSession, ClientError
+from dotenv import load_dotenv
+
+from src.utils.ids import IDGenerator, MAX_WORKER
+from src.utils.database import Database
+
+
+WORDS = (
+    "moot", "post", "length", "minimum", "social", "platform", "twist", "thought", "long",
+    "form", "writing", "discord", "reply", "thread", "search", "feed", "latency", "cache",
+)
+
+ROUTES = ("/", "/users/{id}", "/moots/{id}", "/new/post", "/search")
+
+# A handful of clients posting and searching flat out would spend most of the run
+# rate limited, so the server is started with limits it can't reach.
+UNLIMITED = {"POST_RATE": "1000000", "POST_BURST": "1000000", "SEARCH_RATE": "1000000", "SEARCH_BURST": "1000000"}
+
+
+def make_content(random: Random, minimum: int = 280, maximum: int = 4000) -> str:
+    """Generate Moot content of a random length, with the odd paragraph break."""
+
+    length = random.randint(minimum, maximum)
+    words = []
+    total = 0
+
+    while total < length:
+        word = random.choice(WORDS)
+        words.append(word + ("\n" if random.random() < 0.05 else " "))
+        total += len(words[-1])
+
+    return "".join(words)
+
+
+async def seed(db: Database, users: int, moots: int, random: Random) -> dict:
+    """Fill the database with synthetic users, one session each, and Moots."""
+
+    run_id = token_hex(4)
+    user_ids = [random.randrange(1 << 40, 1 << 62) for _ in range(users)]
+    expires = datetime.utcnow() + timedelta(days=1)
+    tokens = [token_hex(64) for _ in user_ids]
+
+    async with db.pool.acquire() as connection:
+        await connection.copy_records_to_table("users", records=[
+            (id, f"bench-{run_id}-{i}", None) for i, id in enumerate(user_ids)
+        ], columns=("id", "username", "avatar_hash"))
+        await connection.copy_records_to_table(
+            "usersessions", records=list(zip(tokens, user_ids, [expires] * users)), columns=("token", "author_id", "expires"),
+        )
+
+    ids = IDGenerator(await db.claim_worker_id(MAX_WORKER + 1))
+    moot_ids = ids.next_many(moots)
+
+    for start in range(0, moots, 5000):
+        await db.bulk_create_moots([
+            (id, random.choice(user_ids), make_content(random), None, False)
+            for id in moot_ids[start:start + 5000]
+        ])
+
+    return dict(user_ids=user_ids, tokens=tokens, moot_ids=moot_ids)
+
+
+async def sample(db: Database, random: Random) -> dict:
+    """Pick existing users, sessions and Moots to request."""
+
+    tokens = await db.pool.fetch("SELECT token, author_id FROM UserSessions WHERE expires > $1 LIMIT 1000;", datetime.utcnow())
+    moots = await db.pool.fetch("SELECT id FROM Moots ORDER BY id DESC LIMIT 1000;")
+
+    return dict(
+        user_ids=[row["author_id"] for row in tokens],
+        tokens=[row["token"] for row in tokens],
+        moot_ids=[row["id"] for row in moots],
+    )
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+async def drive(base: str, data: dict, concurrency: int, duration: float, random: Random) -> Dict[str, dict]:
+    """Request the hot routes from concurrent clients for a fixed duration."""
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    limited = defaultdict(int)
+    deadline = perf_counter() + duration
+
+    async def client(token: str) -> None:
+        async with ClientSession(cookies={"moot_session_token": token}) as session:
+            while perf_counter() < deadline:
+                route = random.choice(ROUTES)
+                started = perf_counter()
+
+                try:
+                    if route == "/new/post":
+                        response = await session.post(base + route, json={"content": make_content(random, 280, 600)})
+                    else:
+                        path = route.format(id=random.choice(data["moot_ids" if "moots" in route else "user_ids"]))
+                        params = {"q": random.choice(WORDS)} if route == "/search" else None
+                        response = await session.get(base + path, params=params, allow_redirects=False)
+
+                    await response.read()
+
+                    if response.status == 429:
+                        limited[route] += 1
+                        continue
+
+                    if response.status >= 400:
+                        errors[route] += 1
+                        continue
+                except ClientError:
+                    errors[route] += 1
+                    continue
+
+                latencies[route].append(perf_counter() - started)
+
+    await gather(*[client(random.choice(data["tokens"])) for _ in range(concurrency)])
+
+    return {
+        route: dict(
+            requests=len(latencies[route]),
+            errors=errors[route],
+            limited=limited[route],
+            rps=len(latencies[route]) / duration,
+            p50=percentile(latencies[route], 50),
+            p95=percentile(latencies[route], 95),
+            p99=percentile(latencies[route], 99),
+        )
+        for route in ROUTES
+    }
+
+
+async def wait_until_up(base: str, timeout: float = 30) -> None:
+    deadline = perf_counter() + timeout
+
+    async with ClientSession() as session:
+        while perf_counter() < deadline:
+            try:
+                async with session.get(base + "/ping") as response:
+                    if response.status == 200:
+                        return
+            except ClientError:
+                pass
+
+            await sleep(0.2)
+
+    raise RuntimeError("The server didn't start in time.")
+
+
+def compare(result: dict, path: str) -> None:
+    with open(path) as f:
+        previous = load(f)
+
+    print(f"\ncompared to {previous.get('commit', path)}:")
+
+    for route, stats in result["routes"].items():
+        old = previous["routes"].get(route)
+
+        if not old or not old["p50"]:
+            continue
+
+        print(
+            f"{route:>12}  p50 {stats['p50'] / old['p50'] - 1:+7.1%}  "
+            f"p99 {stats['p99'] / max(old['p99'], 1e-9) - 1:+7.1%}  "
+            f"rps {stats['rps'] / max(old['rps'], 1e-9) - 1:+7.1%}"
+        )
+
+
+async def main() -> None:
+    parser = ArgumentParser(description="Load test the hot routes of main:app.")
+    parser.add_argument("--seed", action="store_true", help="Insert synthetic data first.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--moots", type=int, default=50000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate-limits", action="store_true", help="Keep the server's per user rate limits.")
+    parser.add_argument("--random-seed", type=int, default=0)
+    parser.add_argument("--output", help="Where to write the JSON results.")
+    parser.add_argument("--compare", help="An earlier JSON result to compare against.")
+    args = parser.parse_args()
+
+    load_dotenv()
+    random = Random(args.random_seed)
+
+    db = Database()
+    await db.ainit()
+
+    data = await seed(db, args.users, args.moots, random) if args.seed else await sample(db, random)
+
+    if not data["tokens"] or not data["moot_ids"]:
+        raise SystemExit("No sessions or Moots to request, run with --seed.")
+
+    commit = check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    base = f"http://127.0.0.1:{args.port}"
+
+    server = Popen(
+        ["uvicorn", "main:app", "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"],
+        env={**environ, **({} if args.rate_limits else UNLIMITED), "BASE_URL": getenv("BASE_URL", base)},
+    )
+
+    try:
+        await wait_until_up(base)
+        routes = await drive(base, data, args.concurrency, args.duration, random)
+    finally:
+        server.terminate()
+        server.wait()
+
+    result = dict(
+        commit=commit,
+        time=datetime.utcnow().isoformat(),
+        concurrency=args.concurrency,
+        duration=args.duration,
+        workers=args.workers,
+        rate_limits=args.rate_limits,
+        routes=routes,
+    )
+
+    print(f"{'route':>12} {'requests':>9} {'errors':>7} {'limited':>8} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+    for route, stats in routes.items():
+        print(
+            f"{route:>12} {stats['requests']:>9} {stats['errors']:>7} {stats['limited']:>8} {stats['rps']:>8.1f} "
+            f"{stats['p50'] * 1000:>8.2f} {stats['p95'] * 1000:>8.2f} {stats['p99'] * 1000:>8.2f}"
+        )
+
+    output = args.output or f"benchmarks/results/{commit}.json"
+
+    with open(output, "w") as f:
+        dump(result, f, indent=2)
+
+    print(f"\nwrote {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    run(main())
@@ -0,0 +1,115 @@
+"""Compare building models from records with `Model(**dict(record))` against `from_record`.
+
+    python -m benchmarks.models
+
+Uses real asyncpg records when DB_DSN is set, otherwise a tuple stand-in with the
+same mapping interface.
+"""
+
+from os import getenv
+from asyncio import run
+from timeit import timeit
+from tracemalloc import start, stop, take_snapshot
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from src.utils.bitfield import BitField
+from src.utils.datamodels import User, USER_COLUMNS
+
+
+SIZES = (15, 100, 1000)
+FIELDS = tuple(USER_COLUMNS.split(", "))
+INDEXES = {field: index for index, field in enumerate(FIELDS)}
+
+
+@dataclass
+class DictUser:
+    """The User model as it was before slots, for comparison."""
+
+    id: int
+    username: str
+    avatar_hash: Optional[str]
+    bio: Optional[str]
+    banned: bool
+    flags: int
+    follower_count: int
+
+    @property
+    def admin(self) -> bool:
+        return bool(BitField(self.flags)[0])
+
+
+class StandInRecord(tuple):
+    __slots__ = ()
+
+    def keys(self):
+        return FIELDS
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = INDEXES[key]
+        return tuple.__getitem__(self, key)
+
+
+def old_path(records):
+    users = [DictUser(**dict(record)) for record in records]
+    return [user.admin for user in users], users
+
+
+def new_path(records):
+    users = [User.from_record(record) for record in records]
+    return [user.admin for user in users], users
+
+
+def allocated(func, records) -> int:
+    start()
+    before = take_snapshot()
+    result = func(records)
+    after = take_snapshot()
+    stop()
+
+    del result
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+
+async def fetch_records(size: int) -> list:
+    from asyncpg import connect
+
+    conn = await connect(getenv("DB_DSN"))
+
+    try:
+        return await conn.fetch(
+            "SELECT i::bigint AS id, 'user' || i AS username, md5(i::text) AS avatar_hash, "
+            "NULL::text AS bio, false AS banned, (i % 4)::bigint AS flags, 0 AS follower_count FROM generate_series(1, $1) i;",
+            size,
+        )
+    finally:
+        await conn.close()
+
+
+def stand_in_records(size: int) -> list:
+    return [StandInRecord((i, f"user{i}", f"{i:032x}", None, False, i % 4, 0)) for i in range(size)]
+
+
+def main() -> None:
+    load_dotenv()
+
+    real = bool(getenv("DB_DSN"))
+    print(f"records: {'asyncpg' if real else 'stand-in'}")
+
+    for size in SIZES:
+        records = run(fetch_records(size)) if real else stand_in_records(size)
+        number = max(1, 20000 // size)
+
+        for name, func in (("**dict(record)", old_path), ("from_record", new_path)):
+            seconds = timeit(lambda: func(records), number=number) / number
+            print(
+                f"{size:>5} rows {name:>15}: {seconds / size * 1e9:8.1f}ns/row, "
+                f"{allocated(func, records) / size:8.1f}B/row"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Compare moderating Moots one request at a time against the bulk Database methods.
+
+    python -m benchmarks.moderation --sizes 10 100 1000
+
+Runs against the Postgres database in DB_DSN, which must already have the
+migrations in src/data applied. Each run creates a throwaway user with fresh
+Moots, so every path acts on the same amount of data, and deletes it afterwards.
+"""
+
+from random import Random
+from time import perf_counter
+from secrets import token_hex
+from argparse import ArgumentParser
+from asyncio import run
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Tuple
+
+from dotenv import load_dotenv
+
+from src.utils.ids import IDGenerator, MAX_WORKER
+from src.utils.database import Database
+from benchmarks.load import make_content
+
+
+async def setup(db: Database, ids: IDGenerator, size: int, random: Random) -> Tuple[int, List[int]]:
+    """Create a throwaway user with a session and `size` Moots, returning their IDs."""
+
+    user_id = random.randrange(1 << 40, 1 << 62)
+    moot_ids = ids.next_many(size)
+
+    await db.create_user(user_id, f"bench-{token_hex(4)}")
+    await db.create_session(token_hex(64), user_id, datetime.utcnow() + timedelta(days=1))
+    await db.bulk_create_moots([(id, user_id, make_content(random), None, False) for id in moot_ids])
+
+    return user_id, moot_ids
+
+
+async def hide_each(db: Database, user_id: int, moot_ids: List[int]) -> None:
+    for id in moot_ids:
+        await db.hide_moot(id)
+
+
+async def hide_bulk(db: Database, user_id: int, moot_ids: List[int]) -> None:
+    await db.hide_moots(moot_ids)
+
+
+async def delete_each(db: Database, user_id: int, moot_ids: List[int]) -> None:
+    for id in moot_ids:
+        await db.delete_moot(id)
+
+
+async def delete_bulk(db: Database, user_id: int, moot_ids: List[int]) -> None:
+    await db.delete_moots(moot_ids)
+
+
+async def purge_each(db: Database, user_id: int, moot_ids: List[int]) -> None:
+    # What a moderator has to do with the single item endpoints: look up and ban
+    # the user, then hide their Moots one at a time. Their sessions stay valid.
+    await db.get_user(user_id)
+    await db.set_banned(user_id, True)
+
+    for id in moot_ids:
+        await db.hide_moot(id)
+
+
+async def purge_bulk(db: Database, user_id: int, moot_ids: List[int]) -> None:
+    await db.ban_and_purge(user_id)
+
+
+PATHS = (
+    ("hide", hide_each, hide_bulk),
+    ("delete", delete_each, delete_bulk),
+    ("ban + hide", purge_each, purge_bulk),
+)
+
+
+async def measure(db: Database, ids: IDGenerator, size: int, random: Random, path: Callable[..., Awaitable[None]]) -> float:
+    user_id, moot_ids = await setup(db, ids, size, random)
+
+    try:
+        started = perf_counter()
+        await path(db, user_id, moot_ids)
+        return perf_counter() - started
+    finally:
+        await db.pool.execute("DELETE FROM Users WHERE id = $1;", user_id)
+
+
+async def main() -> None:
+    parser = ArgumentParser(description="Compare per item and bulk moderation.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--random-seed", type=int, default=0)
+    args = parser.parse_args()
+
+    load_dotenv()
+    random = Random(args.random_seed)
+
+    db = Database()
+    await db.ainit()
+
+    ids = IDGenerator(await db.claim_worker_id(MAX_WORKER + 1))
+
+    print(f"{'action':>12} {'moots':>6} {'per item ms':>12} {'bulk ms':>9} {'speedup':>8}")
+
+    try:
+        for name, each, bulk in PATHS:
+            for size in args.sizes:
+                each_seconds = await measure(db, ids, size, random, each)
+                bulk_seconds = await measure(db, ids, size, random, bulk)
+
+                print(
+                    f"{name:>12} {size:>6} {each_seconds * 1000:>12.2f} {bulk_seconds * 1000:>9.2f} "
+                    f"{each_seconds / bulk_seconds:>7.1f}x"
+                )
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    run(main())
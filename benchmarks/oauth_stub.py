@@ -0,0 +1,107 @@
+"""Exercise OAuthClient against a local stub of the Discord OAuth API.
+
+    python -m benchmarks.oauth_stub
+
+Checks the happy path, retries, timeouts and the circuit breaker, and times
+logins over the pooled connection.
+"""
+
+from os import environ
+from time import perf_counter
+from asyncio import run, sleep
+
+from aiohttp import web
+from fastapi.exceptions import HTTPException
+
+environ.update(
+    CLIENT_ID="1",
+    CLIENT_SECRET="secret",
+    BASE_URL="http://127.0.0.1",
+    DISCORD_API_URL="http://127.0.0.1:8766",
+    OAUTH_TIMEOUT="0.5",
+    OAUTH_BREAKER_THRESHOLD="3",
+    OAUTH_BREAKER_RESET="1",
+)
+
+from src.utils.oauth import OAuthClient
+
+
+class Stub:
+    def __init__(self) -> None:
+        self.delay = 0.0
+        self.user_failures = 0
+        self.hits = 0
+
+    async def token(self, request: web.Request) -> web.Response:
+        self.hits += 1
+        await sleep(self.delay)
+        return web.json_response({"access_token": "token"})
+
+    async def user(self, request: web.Request) -> web.Response:
+        self.hits += 1
+
+        if self.user_failures:
+            self.user_failures -= 1
+            return web.Response(status=502)
+
+        return web.json_response({"id": "1234", "username": "stub", "discriminator": "0001"})
+
+
+async def expect_unavailable(client: OAuthClient) -> None:
+    try:
+        await client.get_user_details("code")
+    except HTTPException as e:
+        assert e.status_code == 503, e.status_code
+    else:
+        raise AssertionError("expected a 503")
+
+
+async def main() -> None:
+    stub = Stub()
+    app = web.Application()
+    app.router.add_post("/oauth2/token", stub.token)
+    app.router.add_get("/users/@me", stub.user)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 8766).start()
+
+    client = OAuthClient()
+    await client.start()
+
+    try:
+        assert (await client.get_user_details("code"))["id"] == "1234"
+        print("login: ok")
+
+        stub.user_failures = 1
+        assert (await client.get_user_details("code"))["id"] == "1234"
+        print("retry after 502: ok")
+
+        stub.delay = 1
+        started = perf_counter()
+        await expect_unavailable(client)
+        print(f"timeout: 503 after {perf_counter() - started:.2f}s")
+
+        await expect_unavailable(client)
+        await expect_unavailable(client)
+        hits = stub.hits
+        await expect_unavailable(client)
+        assert stub.hits == hits, "breaker let a call through"
+        print("breaker: open after 3 failures")
+
+        stub.delay = 0
+        await sleep(1)
+        assert (await client.get_user_details("code"))["id"] == "1234"
+        print("breaker: closed again after reset")
+
+        started = perf_counter()
+        for _ in range(500):
+            await client.get_user_details("code")
+        print(f"500 logins: {(perf_counter() - started) / 500 * 1000:.2f}ms each")
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    run(main())
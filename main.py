@@ -1,66 +1,215 @@
 from os import getenv
 
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
-from aiohttp import ClientSession
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.exceptions import HTTPException
 
+from src.utils.feed import Feed
+from src.utils.static import HashedStaticFiles
+from src.utils.compression import CompressionMiddleware
+from src.utils.sweeper import Sweeper
+from src.utils.lease import WorkerLease
+from src.utils.admission import Admission
+from src.utils.ratelimit import RateLimiter
+from src.utils.metrics import Metrics, COUNT_BUCKETS, InstrumentMiddleware, instrument_database, route_paths
+from src.utils.oauth import OAuthClient
 from src.utils.ids import IDGenerator
+from src.utils.auth import LazyAuth
 from src.utils.database import Database
 from src.routing import frontend_router, api_router
+from src.routing.frontend import templates as frontend_templates
 
 
 if not getenv("IN_DOCKER"):
     load_dotenv()
 
+static = HashedStaticFiles(directory="static")
+
 app = FastAPI(docs_url=None, redoc_url=None, apoenapi_url=None)
-app.mount("/static", StaticFiles(directory="static"), "static")
+app.add_middleware(CompressionMiddleware)
+app.mount("/static", static, "static")
 app.include_router(frontend_router)
 app.include_router(api_router)
 
 templates = Jinja2Templates(directory="templates")
-session = ClientSession()
+
+for env in (templates.env, frontend_templates.env):
+    env.globals["static_url"] = static.url
+
+oauth = OAuthClient()
 db = Database()
 ids = IDGenerator()
+feed = Feed(db)
+worker_lease = WorkerLease.from_env(db, ids)
+session_sweeper = Sweeper(
+    "session",
+    lambda: db.sweep_sessions(int(getenv("SESSION_SWEEP_BATCH", 1000))),
+    float(getenv("SESSION_SWEEP_INTERVAL", 300)),
+)
+timeline_sweeper = Sweeper(
+    "timeline",
+    lambda: db.sweep_timelines(
+        float(getenv("TIMELINE_RETENTION_DAYS", 30)) * 86400,
+        int(getenv("TIMELINE_SWEEP_BATCH", 10000)),
+    ),
+    float(getenv("TIMELINE_SWEEP_INTERVAL", 3600)),
+)
+admission = Admission(
+    int(getenv("ADMISSION_MAX_IN_FLIGHT", 256)),
+    int(getenv("ADMISSION_MAX_WAITERS", 64)),
+    int(getenv("ADMISSION_RETRY_AFTER", 1)),
+)
+post_limiter = RateLimiter(
+    float(getenv("POST_RATE", 0.1)),
+    int(getenv("POST_BURST", 3)),
+    int(getenv("RATE_LIMIT_SIZE", 65536)),
+)
+search_limiter = RateLimiter(
+    float(getenv("SEARCH_RATE", 1)),
+    int(getenv("SEARCH_BURST", 10)),
+    int(getenv("RATE_LIMIT_SIZE", 65536)),
+)
+
+# Paths which never look at the user, so never read the session cookie.
+AUTH_EXEMPT_PATHS = ("/static", "/ping", "/metrics")
+
+# Paths which never touch the database, so are always admitted.
+ADMISSION_EXEMPT_PATHS = ("/static", "/ping", "/metrics")
+
+metrics = Metrics()
+instrument_database(db, metrics)
+
+request_latency = metrics.histogram("moot_request_seconds", "Time spent handling requests, by route.")
+request_count = metrics.counter("moot_requests_total", "Requests handled, by route and status.")
+request_db_calls = metrics.histogram("moot_request_db_calls", "Database queries sent per request, by route.", COUNT_BUCKETS)
+
+metrics.gauge("moot_db_pool_connections", "Database pool connections, by state.", lambda: {
+    (("state", state),): value for state, value in db.pool_stats().items()
+} if db.pool else {})
+metrics.gauge("moot_session_sweeps_total", "Expired session sweeps run, by outcome.", lambda: {
+    (("outcome", "success"),): session_sweeper.runs,
+    (("outcome", "failure"),): session_sweeper.failures,
+}, "counter")
+metrics.gauge("moot_sessions_reclaimed_total", "Expired sessions deleted by the sweeper.", lambda: {
+    (): session_sweeper.reclaimed,
+}, "counter")
+metrics.gauge("moot_timeline_entries_reclaimed_total", "Expired home timeline entries deleted by the sweeper.", lambda: {
+    (): timeline_sweeper.reclaimed,
+}, "counter")
+metrics.gauge("moot_requests_in_flight", "Admitted requests being handled.", lambda: {
+    (): admission.in_flight,
+})
+metrics.gauge("moot_requests_shed_total", "Requests turned away with a 503 under load.", lambda: {
+    (): admission.shed,
+}, "counter")
+metrics.gauge("moot_requests_limited_total", "Requests turned away with a 429 by a rate limit, by action.", lambda: {
+    (("action", "post"),): post_limiter.limited,
+    (("action", "search"),): search_limiter.limited,
+}, "counter")
+metrics.gauge("moot_db_replicas", "Read replicas, by health.", lambda: {
+    (("state", "healthy"),): len(db.replicas.healthy),
+    (("state", "unhealthy"),): len(db.replicas) - len(db.replicas.healthy),
+})
 
 @app.on_event("startup")
 async def on_startup() -> None:
-    """Connect the database on startup."""
+    """Connect the database, claim a worker ID and start background tasks."""
 
     await db.ainit()
+    await oauth.start()
+    await worker_lease.start()
+
+    session_sweeper.start()
+    timeline_sweeper.start()
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    """Stop background tasks and close the OAuth client and database on shutdown."""
+
+    await session_sweeper.stop()
+    await timeline_sweeper.stop()
+    await worker_lease.stop()
+    await oauth.close()
+    await db.close()
 
 @app.middleware("http")
 async def attach(request: Request, call_next) -> Response:
-    """Attach the ClientSession, database and idgen to requests."""
+    """Attach the OAuth client, database, idgen, feed and rate limiters to requests."""
 
-    request.state.session = session
+    request.state.oauth = oauth
     request.state.db = db
     request.state.ids = ids
+    request.state.feed = feed
+    request.state.post_limiter = post_limiter
+    request.state.search_limiter = search_limiter
 
     return await call_next(request)
 
 @app.middleware("http")
 async def authorize(request: Request, call_next) -> Response:
-    """Authorize the request."""
+    """Attach the request's lazily resolved authentication state."""
 
-    session = request.cookies.get("moot_session_token", "")
+    if request.url.path.startswith(AUTH_EXEMPT_PATHS):
+        session = ""
+    else:
+        session = request.cookies.get("moot_session_token", "")
 
-    request.state.auth = await db.get_auth(session)
+    request.state.auth = LazyAuth(db, session)
 
     return await call_next(request)
 
+@app.middleware("http")
+async def admit(request: Request, call_next) -> Response:
+    """Shed requests with a 503 while too many are in flight or waiting on the database pool."""
+
+    if request.url.path.startswith(ADMISSION_EXEMPT_PATHS):
+        return await call_next(request)
+
+    waiters = db.pool_stats()["waiters"] if db.pool else 0
+
+    if not admission.enter(waiters):
+        return Response("Moot is overloaded, please try again shortly.", 503, headers={
+            "Retry-After": str(admission.retry_after),
+        })
+
+    try:
+        return await call_next(request)
+    finally:
+        admission.leave()
+
+def observe_request(scope: dict, status: int, seconds: float, calls: int) -> None:
+    """Record a request's latency up to its last byte, status and database queries."""
+
+    if not hasattr(app.state, "route_paths"):
+        app.state.route_paths = route_paths(app)
+
+    route = app.state.route_paths.get(scope.get("endpoint"), "unmatched")
+
+    request_latency.observe(seconds, method=scope["method"], route=route)
+    request_count.inc(method=scope["method"], route=route, status=status)
+    request_db_calls.observe(calls, method=scope["method"], route=route)
+
+# Added last, so it wraps every other middleware.
+app.add_middleware(InstrumentMiddleware, observe=observe_request)
+
 @app.exception_handler(HTTPException)
 async def handler(request: Request, exc: HTTPException) -> Response:
-    if exc.status_code == 404:
+    if exc.status_code == 404 and not request.url.path.startswith("/api/"):
         return templates.TemplateResponse("404.html", {
             "request": request,
         })
-    return Response(exc.detail, exc.status_code)
+    return Response(exc.detail, exc.status_code, headers=getattr(exc, "headers", None))
 
 @app.get("/ping")
 async def ping() -> dict:
     """Get a static ping response showing the site is online."""
 
     return dict(status="ok")
+
+@app.get("/metrics")
+async def get_metrics() -> PlainTextResponse:
+    """Get the site's metrics in the Prometheus text format."""
+
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS moots_author_id_id_idx ON Moots (author_id, id);
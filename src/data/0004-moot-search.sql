@@ -0,0 +1,4 @@
+ALTER TABLE Moots ADD COLUMN IF NOT EXISTS content_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', content)) STORED;
+
+CREATE INDEX IF NOT EXISTS moots_content_tsv_idx ON Moots USING gin (content_tsv);
@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS usersessions_expires_idx ON UserSessions (expires);
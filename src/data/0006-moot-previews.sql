@@ -0,0 +1,15 @@
+ALTER TABLE Moots ADD COLUMN IF NOT EXISTS preview TEXT;
+ALTER TABLE Moots ADD COLUMN IF NOT EXISTS truncated BOOLEAN;
+ALTER TABLE Moots ADD COLUMN IF NOT EXISTS content_length INTEGER;
+
+-- Must match make_preview in src/utils/datamodels.py: the first 20 lines of the first 1024 characters.
+UPDATE Moots SET
+    preview = array_to_string((string_to_array(left(content, 1024), E'\n'))[1:20], E'\n'),
+    content_length = char_length(content)
+WHERE preview IS NULL;
+
+UPDATE Moots SET truncated = preview <> content WHERE truncated IS NULL;
+
+ALTER TABLE Moots ALTER COLUMN preview SET NOT NULL;
+ALTER TABLE Moots ALTER COLUMN truncated SET NOT NULL;
+ALTER TABLE Moots ALTER COLUMN content_length SET NOT NULL;
@@ -0,0 +1,18 @@
+ALTER TABLE Users ADD COLUMN IF NOT EXISTS follower_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS Follows (
+    follower_id     BIGINT NOT NULL REFERENCES Users (id) ON DELETE CASCADE,
+    followee_id     BIGINT NOT NULL REFERENCES Users (id) ON DELETE CASCADE,
+    PRIMARY KEY (follower_id, followee_id)
+);
+
+CREATE INDEX IF NOT EXISTS follows_followee_id_idx ON Follows (followee_id, follower_id);
+
+-- Each user's home timeline: the Moots fanned out to them when posted, newest last in the index.
+CREATE TABLE IF NOT EXISTS Timelines (
+    user_id         BIGINT NOT NULL REFERENCES Users (id) ON DELETE CASCADE,
+    moot_id         BIGINT NOT NULL REFERENCES Moots (id) ON DELETE CASCADE,
+    PRIMARY KEY (user_id, moot_id)
+);
+
+CREATE INDEX IF NOT EXISTS timelines_moot_id_idx ON Timelines (moot_id);
@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS moots_reference_id_idx ON Moots (reference, id) WHERE reference IS NOT NULL;
@@ -1,8 +1,12 @@
 from fastapi import APIRouter
 
 from .oauth import router as oauth_router
+from .moots import router as moots_router
+from .search import router as search_router
 
 
 router = APIRouter(prefix="/api")
 
 router.include_router(oauth_router)
+router.include_router(moots_router)
+router.include_router(search_router)
@@ -0,0 +1,107 @@
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Query, Request
+from fastapi.exceptions import HTTPException
+
+from src.utils.ids import get_datetime
+from src.utils.serialise import FastJSONResponse
+from src.utils.datamodels import ResolvedMoot, User
+
+
+router = APIRouter(prefix="/v1")
+
+MAX_PAGE_SIZE = 50
+
+# Snowflakes can exceed the 53 bits a JavaScript number holds exactly, so every
+# ID in this API is sent as a string.
+def serialise_user(user: User) -> dict:
+    """Serialise a Moot author for the feed API."""
+
+    return dict(user.public, id=str(user.id))
+
+def serialise_moot(resolved: ResolvedMoot, preview: bool) -> dict:
+    """Serialise a Moot for the feed API, with only a sample of its content if previewing."""
+
+    moot = resolved.moot
+
+    return dict(
+        id=str(moot.id),
+        author_id=str(moot.author_id),
+        reference=None if moot.reference is None else str(moot.reference),
+        created_at=get_datetime(moot.id).isoformat(),
+        hidden=moot.hide,
+        content=ResolvedMoot(resolved.user, moot, use_sample=preview).content,
+        length=moot.content_length,
+        truncated=preview and moot.truncated and not moot.hide,
+    )
+
+def page(moots: List[ResolvedMoot], limit: int, preview: bool) -> FastJSONResponse:
+    """Build a page of Moots with their authors listed once each and cursors to the adjacent pages."""
+
+    users: Dict[str, dict] = {}
+
+    for resolved in moots:
+        if str(resolved.user.id) not in users:
+            users[str(resolved.user.id)] = serialise_user(resolved.user)
+
+    return FastJSONResponse(dict(
+        moots=[serialise_moot(resolved, preview) for resolved in moots],
+        users=users,
+        before=str(moots[-1].moot.id) if len(moots) == limit else None,
+        after=str(moots[0].moot.id) if moots else None,
+    ))
+
+async def authorize(request: Request) -> User:
+    auth = await request.state.auth
+
+    if not auth.user:
+        raise HTTPException(403, "Not authorized.")
+
+    auth.user.raise_banned()
+
+    return auth.user
+
+@router.get("/moots")
+async def get_moots(
+    request: Request,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: int = Query(15, ge=1, le=MAX_PAGE_SIZE),
+    preview: bool = False,
+) -> FastJSONResponse:
+    """Get a page of the newest Moots, newest first."""
+
+    await authorize(request)
+
+    feed = request.state.feed
+
+    if preview and before is None and after is None and limit <= feed.size:
+        return page(await feed.latest(limit), limit, preview)
+
+    moots = await request.state.db.get_all_recent_moots(limit, before, after, preview)
+    users = await request.state.db.get_users(list(set([moot.author_id for moot in moots])))
+    users = {user.id: user for user in users}
+
+    return page([ResolvedMoot(users[moot.author_id], moot) for moot in moots], limit, preview)
+
+@router.get("/users/{userid}/moots")
+async def get_user_moots(
+    userid: int,
+    request: Request,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: int = Query(15, ge=1, le=MAX_PAGE_SIZE),
+    preview: bool = False,
+) -> FastJSONResponse:
+    """Get a page of a user's Moots, newest first."""
+
+    await authorize(request)
+
+    user = await request.state.db.get_user(userid)
+
+    if not user:
+        raise HTTPException(404, "Unknown user.")
+
+    moots = await request.state.db.get_recent_moots(userid, limit, before, after, preview)
+
+    return page([ResolvedMoot(user, moot) for moot in moots], limit, preview)
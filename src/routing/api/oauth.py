@@ -1,8 +1,6 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse
 
-from src.utils.oauth import get_user_details
-
 
 router = APIRouter()
 
@@ -10,7 +8,7 @@ router = APIRouter()
 async def auth_callback(request: Request) -> RedirectResponse:
     """Authenticate the user with Discord OAuth."""
 
-    user = await get_user_details(request.state.session, request.query_params["code"])
+    user = await request.state.oauth.get_user_details(request.query_params["code"])
 
     userid = int(user["id"])
     username = user["username"] + "#" + user["discriminator"]
@@ -21,3 +19,16 @@ async def auth_callback(request: Request) -> RedirectResponse:
     response = RedirectResponse("/")
     response.set_cookie("moot_session_token", session.token)
     return response
+
+@router.get("/logout")
+async def logout(request: Request) -> RedirectResponse:
+    """End the user's session and clear their session cookie."""
+
+    token = request.cookies.get("moot_session_token")
+
+    if token:
+        await request.state.db.delete_session(token)
+
+    response = RedirectResponse("/")
+    response.delete_cookie("moot_session_token")
+    return response
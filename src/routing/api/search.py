@@ -0,0 +1,57 @@
+from os import getenv
+from typing import Optional
+
+from fastapi import APIRouter, Request
+from fastapi.exceptions import HTTPException
+
+from src.utils.cache import TTLCache
+
+
+router = APIRouter()
+
+# Prefixes this short match too many usernames for the trigram index to help, so
+# their results are shared between requests instead.
+CACHED_PREFIX_LENGTH = 3
+
+_typeahead_cache: Optional[TTLCache] = None
+
+def typeahead_cache() -> TTLCache:
+    """Get the shared cache of short prefix results, built on first use so .env is loaded by then."""
+
+    global _typeahead_cache
+
+    if _typeahead_cache is None:
+        _typeahead_cache = TTLCache(
+            int(getenv("TYPEAHEAD_CACHE_SIZE", 2048)),
+            float(getenv("TYPEAHEAD_CACHE_TTL", 60)),
+        )
+
+    return _typeahead_cache
+
+@router.get("/search/users")
+async def typeahead(q: str, request: Request) -> list:
+    """Get username suggestions for a search prefix."""
+
+    auth = await request.state.auth
+
+    if not auth.user:
+        raise HTTPException(403, "Not authorized.")
+
+    prefix = q.strip().lower()
+
+    if not prefix:
+        return []
+
+    if len(prefix) <= CACHED_PREFIX_LENGTH:
+        results = typeahead_cache().get(prefix)
+
+        if results is None:
+            users = await request.state.db.search_usernames(prefix)
+            results = [user.public for user in users]
+            typeahead_cache().set(prefix, results)
+
+        return results
+
+    users = await request.state.db.search_usernames(prefix)
+
+    return [user.public for user in users]
@@ -1,27 +1,44 @@
-from os import getenv
+from typing import Optional
 
 from fastapi import APIRouter, Request
 from fastapi.exceptions import HTTPException
 from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.templating import Jinja2Templates
 
-from src.utils.datamodels import ResolvedMoot, NewPost
+from src.utils.ids import NoWorkerID
+from src.utils.streaming import TemplateStream
+from src.utils.og import OpenGraph
+from src.utils.fragments import FragmentCache
+from src.utils.conditional import make_etag, not_modified, validators
+from src.utils.datamodels import ResolvedMoot, NewPost, BulkModeration
 
 
 router = APIRouter()
 
 templates = Jinja2Templates(directory="templates")
+fragments = FragmentCache(templates.env)
+og = OpenGraph(templates)
+
+templates.env.globals["render_moot"] = fragments.render
+
+def stream(name: str, context: dict, headers: dict = None) -> TemplateStream:
+    """Stream a template to the client as it renders."""
+
+    return TemplateStream(templates.get_template(name), context, headers=headers)
 
-@router.get("/")
-async def get_index(request: Request) -> HTMLResponse:
-    auth = request.state.auth
 
+PAGE_SIZE = 15
+
+# The most levels and replies a thread view shows below a Moot.
+THREAD_DEPTH = 8
+THREAD_SIZE = 200
+
+@router.get("/")
+async def get_index(request: Request, before: Optional[int] = None, after: Optional[int] = None, feed: str = "all") -> HTMLResponse:
     if "discord" in request.headers.get("User-Agent", "").lower():
-        return templates.TemplateResponse("og.html", {
-            "request": request,
-            "desc": "A social media platform with a twist: a minimum post length!",
-            "image": getenv("BASE_URL") + "/static/images/moot.png",
-        })
+        return HTMLResponse(og.home())
+
+    auth = await request.state.auth
 
     if not auth.user:
         return auth.request_auth()
@@ -29,47 +46,114 @@ async def get_index(request: Request) -> HTMLResponse:
     user = auth.user
     user.raise_banned()
 
-    moots = await request.state.db.get_all_recent_moots(15)
-    users = await request.state.db.get_users(list(set([moot.author_id for moot in moots])))
-    users = {user.id: user for user in users}
+    if feed == "following":
+        timeline = await request.state.db.get_timeline(user.id, PAGE_SIZE, before, after)
+        moots = [ResolvedMoot(author, moot, use_sample=True) for moot, author in timeline]
+    elif before is None and after is None:
+        moots = await request.state.feed.latest(PAGE_SIZE)
+    else:
+        moots = await request.state.db.get_all_recent_moots(PAGE_SIZE, before, after, preview=True)
+        users = await request.state.db.get_users(list(set([moot.author_id for moot in moots])))
+        users = {user.id: user for user in users}
+        moots = [ResolvedMoot(users[moot.author_id], moot, use_sample=True) for moot in moots]
 
-    return templates.TemplateResponse("index.html", {
+    replies = await request.state.db.get_reply_counts([moot.moot.id for moot in moots])
+
+    return stream("index.html", {
         "request": request,
         "user": user,
-        "moots": [ResolvedMoot(users[moot.author_id], moot, use_sample=True) for moot in moots],
+        "moots": moots,
+        "replies": replies,
+        "base": "/?feed=following" if feed == "following" else "/",
+        "feed": feed,
+        "size": PAGE_SIZE,
+        "paged": before is not None or after is not None,
     })
 
 @router.get("/users/{userid}")
-async def get_userpage(userid: int, request: Request) -> HTMLResponse:
-    auth = request.state.auth
+async def get_userpage(userid: int, request: Request, before: Optional[int] = None, after: Optional[int] = None) -> HTMLResponse:
+    auth = await request.state.auth
 
     if not auth.user:
         return auth.request_auth()
 
     user = auth.user
     user.raise_banned()
-    moots = await request.state.db.get_recent_moots(userid, 15)
+    moots = await request.state.db.get_recent_moots(userid, PAGE_SIZE, before, after, preview=True)
     moot_user = await request.state.db.get_user(userid)
+    following = moot_user is not None and userid != user.id and await request.state.db.is_following(user.id, userid)
+    replies = await request.state.db.get_reply_counts([moot.id for moot in moots])
+
+    etag = make_etag(
+        "user", userid, before, after, user.id, user.username, user.avatar_hash, user.admin, following,
+        moot_user and (moot_user.username, moot_user.avatar_hash, moot_user.follower_count),
+        *[(moot.id, moot.hide, replies[moot.id]) for moot in moots],
+    )
+
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
 
-    return templates.TemplateResponse("user.html", {
+    return stream("user.html", {
         "request": request,
         "user": user,
-        "moots": [ResolvedMoot(moot_user, moot) for moot in moots],
-    })
+        "moots": [ResolvedMoot(moot_user, moot, use_sample=True) for moot in moots],
+        "replies": replies,
+        "profile": moot_user,
+        "following": following,
+        "base": f"/users/{userid}",
+        "size": PAGE_SIZE,
+        "paged": before is not None or after is not None,
+    }, headers=validators(etag))
+
+@router.post("/users/{userid}/follow")
+async def follow_user(userid: int, request: Request) -> dict:
+    auth = await request.state.auth
+
+    if not auth.user:
+        raise HTTPException(403, "Not authorized.")
+
+    user = auth.user
+    user.raise_banned()
+
+    if userid == user.id:
+        raise HTTPException(400, "You can't follow yourself.")
+
+    if not await request.state.db.get_user(userid):
+        raise HTTPException(404)
+
+    await request.state.db.follow(user.id, userid)
+
+    return {
+        "following": True,
+    }
+
+@router.post("/users/{userid}/unfollow")
+async def unfollow_user(userid: int, request: Request) -> dict:
+    auth = await request.state.auth
+
+    if not auth.user:
+        raise HTTPException(403, "Not authorized.")
+
+    auth.user.raise_banned()
+
+    await request.state.db.unfollow(auth.user.id, userid)
+
+    return {
+        "following": False,
+    }
 
 @router.get("/moots/{id}")
 async def get_userpage(id: int, request: Request) -> HTMLResponse:
-    auth = request.state.auth
-
     if "discord" in request.headers.get("User-Agent", "").lower():
-        moot = await request.state.db.get_moot(id)
-        user = await request.state.db.get_user(moot.author_id)
+        embed = await og.moot(request.state.db, id)
 
-        return templates.TemplateResponse("og.html", {
-            "request": request,
-            "desc": moot.content[:140] + "...",
-            "image": user.avatar_url,
-        })
+        if embed is None:
+            raise HTTPException(404)
+
+        return HTMLResponse(embed)
+
+    auth = await request.state.auth
 
     if not auth.user:
         return auth.request_auth()
@@ -77,17 +161,36 @@ async def get_userpage(id: int, request: Request) -> HTMLResponse:
     auth.user.raise_banned()
 
     moot = await request.state.db.get_moot(id)
+
+    if not moot:
+        raise HTTPException(404)
+
+    thread, truncated = await request.state.db.get_thread(id, THREAD_DEPTH, THREAD_SIZE)
+
+    # Deleting or hiding a reply isn't recorded with a time, so there's no reliable
+    # Last-Modified; the ETag covers every reply and its hide state instead.
+    etag = make_etag(
+        "moot", moot.id, moot.hide, auth.user.id, auth.user.username, auth.user.avatar_hash, auth.user.admin,
+        *[(reply.id, reply.hide) for reply, _, __ in thread],
+    )
+
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
     user = await request.state.db.get_user(moot.author_id)
 
-    return templates.TemplateResponse("viewmoot.html", {
+    return stream("viewmoot.html", {
         "request": request,
         "user": auth.user,
         "moot": ResolvedMoot(user, moot),
-    })
+        "replies": [(ResolvedMoot(author, reply, use_sample=True), depth) for reply, author, depth in thread],
+        "truncated": truncated,
+    }, headers=validators(etag))
 
 @router.delete("/moots/{id}")
 async def delete_moot(id: int, request: Request) -> Response:
-    auth = request.state.auth
+    auth = await request.state.auth
 
     if not auth.user:
         raise HTTPException(403)
@@ -96,12 +199,15 @@ async def delete_moot(id: int, request: Request) -> Response:
         raise HTTPException(403)
 
     await request.state.db.delete_moot(id)
+    request.state.feed.remove(id)
+    fragments.evict(id)
+    og.evict(id)
 
     return Response()
 
 @router.patch("/moots/{id}")
 async def hide_moot(id: int, request: Request) -> Response:
-    auth = request.state.auth
+    auth = await request.state.auth
 
     if not auth.user:
         raise HTTPException(403)
@@ -110,12 +216,15 @@ async def hide_moot(id: int, request: Request) -> Response:
         raise HTTPException(403)
 
     await request.state.db.hide_moot(id)
+    request.state.feed.hide(id)
+    fragments.evict(id)
+    og.evict(id)
 
     return Response()
 
 @router.get("/new")
-async def new(request: Request) -> HTMLResponse:
-    auth = request.state.auth
+async def new(request: Request, reference: Optional[int] = None) -> HTMLResponse:
+    auth = await request.state.auth
 
     if not auth.user:
         return auth.request_auth()
@@ -126,11 +235,12 @@ async def new(request: Request) -> HTMLResponse:
     return templates.TemplateResponse("new.html", {
         "request": request,
         "user": user,
+        "reference": reference,
     })
 
 @router.post("/new/post")
 async def new_post(data: NewPost, request: Request) -> dict:
-    auth = request.state.auth
+    auth = await request.state.auth
 
     if not auth.user:
         raise HTTPException(403, "Not authorized.")
@@ -141,35 +251,84 @@ async def new_post(data: NewPost, request: Request) -> dict:
     if len(data.content) < 280:
         raise HTTPException(400, "Bad content. Content too short!")
 
-    id = request.state.ids.next()
+    if data.reference is not None:
+        # The parent may be only seconds old, so read it from the primary, not a lagging replica.
+        parent = await request.state.db.get_moot(data.reference, primary=True)
+
+        if not parent or parent.hide:
+            raise HTTPException(400, "Bad reference. You can't reply to that Moot!")
 
-    await request.state.db.create_moot(id, user.id, data.content)
+    try:
+        id = request.state.ids.next()
+    except NoWorkerID:
+        raise HTTPException(503, "Moot can't create posts right now, please try again shortly.", headers={"Retry-After": "5"})
+
+    # Only charged once the post is known to be going in, so rejected posts don't use up the burst.
+    request.state.post_limiter.hit(user.id)
+
+    moot = await request.state.db.create_moot(id, user.id, data.content, data.reference)
+    request.state.feed.add(user, moot)
 
     return {
         "id": id,
     }
 
 @router.get("/search")
-async def new(q: str, request: Request) -> HTMLResponse:
-    auth = request.state.auth
+async def new(q: str, request: Request, mode: str = "users", page: int = 0, cursor: Optional[str] = None) -> HTMLResponse:
+    auth = await request.state.auth
 
     if not auth.user:
         return auth.request_auth()
 
     user = auth.user
     user.raise_banned()
+    request.state.search_limiter.hit(user.id)
+
+    if mode == "moots":
+        before = None
+
+        if cursor:
+            try:
+                rank, id = cursor.split(":")
+                before = (float(rank), int(id))
+            except ValueError:
+                raise HTTPException(400, "Bad search cursor.")
 
-    users = await request.state.db.search_users(q)
+        results = await request.state.db.search_moots(q, PAGE_SIZE, before)
+        users = await request.state.db.get_users(list(set([moot.author_id for moot, _ in results])))
+        users = {user.id: user for user in users}
+
+        if len(results) == PAGE_SIZE:
+            last, rank = results[-1]
+            cursor = f"{rank!r}:{last.id}"
+        else:
+            cursor = None
+
+        return templates.TemplateResponse("search.html", {
+            "request": request,
+            "user": user,
+            "moots": [ResolvedMoot(users[moot.author_id], moot, use_sample=True) for moot, _ in results],
+            "q": q,
+            "mode": mode,
+            "cursor": cursor,
+        })
+
+    page = max(page, 0)
+    users = await request.state.db.search_users(q, PAGE_SIZE, page * PAGE_SIZE)
 
     return templates.TemplateResponse("search.html", {
         "request": request,
         "user": user,
         "users": users,
+        "q": q,
+        "mode": "users",
+        "page": page,
+        "size": PAGE_SIZE,
     })
 
 @router.get("/moderation")
 async def moderation(request: Request) -> HTMLResponse:
-    auth = request.state.auth
+    auth = await request.state.auth
 
     if not auth.user:
         return auth.request_auth()
@@ -186,7 +345,7 @@ async def moderation(request: Request) -> HTMLResponse:
 
 @router.get("/moderation/{user_id}")
 async def get_user_details(request: Request, user_id: int) -> JSONResponse:
-    auth = request.state.auth
+    auth = await request.state.auth
 
     if not auth.user:
         return auth.request_auth()
@@ -205,7 +364,7 @@ async def get_user_details(request: Request, user_id: int) -> JSONResponse:
 
 @router.post("/moderation/{user_id}/ban")
 async def ban_user(request: Request, user_id: int) -> Response:
-    auth = request.state.auth
+    auth = await request.state.auth
 
     if not auth.user:
         return auth.request_auth()
@@ -226,7 +385,7 @@ async def ban_user(request: Request, user_id: int) -> Response:
 
 @router.post("/moderation/{user_id}/unban")
 async def unban_user(request: Request, user_id: int) -> Response:
-    auth = request.state.auth
+    auth = await request.state.auth
 
     if not auth.user:
         return auth.request_auth()
@@ -244,3 +403,71 @@ async def unban_user(request: Request, user_id: int) -> Response:
     await request.state.db.set_banned(user_id, False)
 
     return Response(status_code=200)
+
+@router.post("/moderation/{user_id}/purge")
+async def purge_user(request: Request, user_id: int) -> dict:
+    auth = await request.state.auth
+
+    if not auth.user:
+        return auth.request_auth()
+
+    user = auth.user
+
+    if not user.admin:
+        raise HTTPException(403, "You're not allowed to access this resource!")
+
+    hidden = await request.state.db.ban_and_purge(user_id)
+
+    if hidden is None:
+        raise HTTPException(404)
+
+    for id in hidden:
+        request.state.feed.hide(id)
+        fragments.evict(id)
+        og.evict(id)
+
+    return {
+        "hidden": hidden,
+    }
+
+@router.post("/moderation/bulk/hide")
+async def bulk_hide(data: BulkModeration, request: Request) -> dict:
+    auth = await request.state.auth
+
+    if not auth.user:
+        raise HTTPException(403)
+
+    if not auth.user.admin:
+        raise HTTPException(403)
+
+    hidden = await request.state.db.hide_moots(data.ids)
+
+    for id in hidden:
+        request.state.feed.hide(id)
+        fragments.evict(id)
+        og.evict(id)
+
+    return {
+        "hidden": hidden,
+    }
+
+@router.post("/moderation/bulk/delete")
+async def bulk_delete(data: BulkModeration, request: Request) -> dict:
+    auth = await request.state.auth
+
+    if not auth.user:
+        raise HTTPException(403)
+
+    if not auth.user.admin:
+        raise HTTPException(403)
+
+    deleted = await request.state.db.delete_moots(data.ids)
+
+    for id in deleted:
+        request.state.feed.remove(id)
+        fragments.evict(id)
+        og.evict(id)
+
+    return {
+        "deleted": deleted,
+    }
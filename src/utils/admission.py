@@ -0,0 +1,36 @@
+class Admission:
+    """Decides whether to take on a request, given the requests in flight and the database pool's queue.
+
+    Turning excess requests away straight away keeps the latency of the admitted ones
+    bounded, where queueing them all for a pool connection would slow down everyone.
+    """
+
+    def __init__(self, max_in_flight: int, max_waiters: int, retry_after: int) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_waiters = max_waiters
+        self.retry_after = retry_after
+
+        self.in_flight = 0
+        self.shed = 0
+
+    def enter(self, waiters: int) -> bool:
+        """Try to admit a request.
+
+        Args:
+            waiters (int): The number of requests waiting for a database connection.
+
+        Returns:
+            bool: Whether the request was admitted, in which case leave must be called once it is handled.
+        """
+
+        if self.in_flight >= self.max_in_flight or waiters >= self.max_waiters:
+            self.shed += 1
+            return False
+
+        self.in_flight += 1
+        return True
+
+    def leave(self) -> None:
+        """Mark an admitted request as handled."""
+
+        self.in_flight -= 1
@@ -0,0 +1,28 @@
+from typing import Optional
+
+from .datamodels import AuthState
+
+
+class LazyAuth:
+    """A request's authentication state, only looked up once a handler awaits it."""
+
+    def __init__(self, db, token: str) -> None:
+        self.db = db
+        self.token = token
+
+        self._auth: Optional[AuthState] = None
+
+    def __await__(self):
+        return self.resolve().__await__()
+
+    async def resolve(self) -> AuthState:
+        """Resolve the authentication state, querying the database at most once.
+
+        Returns:
+            AuthState: The request's authentication state.
+        """
+
+        if self._auth is None:
+            self._auth = await self.db.get_auth(self.token)
+
+        return self._auth
@@ -0,0 +1,101 @@
+from time import monotonic
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """A bounded LRU cache whose entries expire after a time to live."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._data: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, None) is not None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a value from the cache, marking it as recently used.
+
+        Args:
+            key (Hashable): The key to look up.
+            default (Any): The value to return on a miss. Defaults to None.
+
+        Returns:
+            Any: The cached value, or the default.
+        """
+
+        entry = self._data.get(key)
+
+        if entry is None:
+            return default
+
+        value, expires = entry
+
+        if expires <= monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Set a value in the cache, evicting the least recently used entry if full.
+
+        Args:
+            key (Hashable): The key to store the value under.
+            value (Any): The value to store.
+            ttl (Optional[float]): A time to live overriding the cache default. Defaults to None.
+        """
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+
+        if ttl <= 0:
+            self._data.pop(key, None)
+            return
+
+        self._data[key] = (value, monotonic() + ttl)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Any:
+        """Remove a key from the cache.
+
+        Args:
+            key (Hashable): The key to remove.
+
+        Returns:
+            Any: The removed value, if it was present.
+        """
+
+        entry = self._data.pop(key, None)
+
+        return entry[0] if entry else None
+
+    def evict(self, predicate: Callable[[Any], bool]) -> int:
+        """Remove every value matching a predicate.
+
+        Args:
+            predicate (Callable[[Any], bool]): Called with each value, entries returning True are removed.
+
+        Returns:
+            int: The number of entries removed.
+        """
+
+        keys = [key for key, (value, _) in self._data.items() if predicate(value)]
+
+        for key in keys:
+            del self._data[key]
+
+        return len(keys)
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+
+        self._data.clear()
@@ -0,0 +1,151 @@
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into encodings and their q-values."""
+
+    encodings = {}
+
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+
+        if name:
+            encodings[name.strip().lower()] = q
+
+    return encodings
+
+
+def add_vary(headers: MutableHeaders, name: str) -> None:
+    """Add a header name to Vary, unless it is already listed, such as by HashedStaticFiles."""
+
+    listed = [value.strip().lower() for value in headers.get("vary", "").split(",")]
+
+    if name.lower() not in listed and "*" not in listed:
+        headers.add_vary_header(name)
+
+
+def negotiate(header: str) -> Optional[str]:
+    """Pick the best response encoding a client accepts, preferring brotli."""
+
+    encodings = accepted_encodings(header)
+    wildcard = encodings.get("*", 0)
+
+    for name in (("br", "gzip") if brotli else ("gzip",)):
+        if encodings.get(name, wildcard) > 0:
+            return name
+
+    return None
+
+
+class Compressor:
+    """Incrementally compresses a response body, flushing after every chunk."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int) -> None:
+        self.encoding = encoding
+
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + (self._brotli.finish() if final else self._brotli.flush())
+
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """Compress text responses with brotli or gzip, negotiated per client.
+
+    Streamed responses are compressed chunk by chunk, so they still reach the client
+    as they're rendered. Responses which are already encoded, such as precompressed
+    static files, or too small to benefit are sent unchanged.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, gzip_level: int = 6, brotli_quality: int = 4) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        compressor: Optional[Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                passthrough = (
+                    "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                )
+
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                compressor = Compressor(encoding, self.gzip_level, self.brotli_quality)
+
+                headers = MutableHeaders(raw=list(start["headers"]))
+                headers["Content-Encoding"] = encoding
+                add_vary(headers, "Accept-Encoding")
+                del headers["Content-Length"]
+
+                await send({**start, "headers": headers.raw})
+
+            await send({
+                "type": "http.response.body",
+                "body": compressor.compress(body, final=not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,68 @@
+from hashlib import sha1
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+from .static import directory_digest
+
+
+# Pages change with templates and static files too, so every deploy changes every ETag.
+VERSION = directory_digest("templates", "static")
+
+
+def make_etag(*parts) -> str:
+    """Build a weak ETag from the values a page depends on."""
+
+    digest = sha1(":".join(str(part) for part in (VERSION,) + parts).encode()).hexdigest()[:20]
+
+    return f'W/"{digest}"'
+
+
+def validators(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    """Get the headers clients need to revalidate a page instead of refetching it."""
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    return headers
+
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """Get a 304 response if the client's cached copy of a page is still current.
+
+    Args:
+        request (Request): The request, with its conditional headers.
+        etag (str): The page's current ETag.
+        last_modified (Optional[datetime]): When the page last changed, as an aware datetime. Defaults to None.
+
+    Returns:
+        Optional[Response]: The 304 response, or None if the page must be sent.
+    """
+
+    if_none_match = request.headers.get("if-none-match")
+
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+
+        if "*" not in tags and etag not in tags and etag[2:] not in tags:
+            return None
+    elif last_modified is not None and "if-modified-since" in request.headers:
+        try:
+            since = parsedate_to_datetime(request.headers["if-modified-since"])
+        except (TypeError, ValueError):
+            return None
+
+        # Dates sent with a -0000 offset parse as naive, but are still in UTC.
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+
+        if last_modified.replace(microsecond=0) > since:
+            return None
+    else:
+        return None
+
+    return Response(status_code=304, headers=validators(etag, last_modified))
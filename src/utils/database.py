@@ -1,11 +1,39 @@
 from os import getenv
 from secrets import token_hex
-from typing import Optional, List
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, List, Tuple, Type
+from time import time
 from datetime import datetime, timedelta
 
-from asyncpg import create_pool, Pool
+from asyncpg import connect, create_pool, Connection, Pool
 
-from .datamodels import User, Session, AuthState, Moot
+from .cache import TTLCache
+from .loader import UserLoader
+from .ids import first_id_at
+from .replicas import ReplicaSet
+from .datamodels import User, Session, AuthState, Moot, make_preview, USER_COLUMNS, MOOT_COLUMNS, PREVIEW_MOOT_COLUMNS, SESSION_COLUMNS
+
+
+MAX_ID = 2**63 - 1
+
+JOINED_USER_COLUMNS = ", ".join(f"u.{column}" for column in USER_COLUMNS.split(", "))
+JOINED_MOOT_COLUMNS = ", ".join(f"m.{column}" for column in MOOT_COLUMNS.split(", "))
+JOINED_PREVIEW_MOOT_COLUMNS = ", ".join(
+    column if column.startswith("NULL") else f"m.{column}" for column in PREVIEW_MOOT_COLUMNS.split(", ")
+)
+MOOT_FIELDS = len(MOOT_COLUMNS.split(", "))
+
+# The advisory lock namespace used to hand out snowflake worker IDs.
+WORKER_LOCK_KEY = 0x6d6f6f74
+
+# The ID of the user the current request is authenticated as, set by get_auth.
+current_user: ContextVar[Optional[int]] = ContextVar("current_user", default=None)
+
+
+def escape_like(text: str) -> str:
+    """Escape the wildcard characters in text used in a LIKE pattern."""
+
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
 
 
 class Database:
@@ -13,11 +41,170 @@ class Database:
 
     def __init__(self) -> None:
         self.pool: Pool = None
+        self.worker_lock: Connection = None
+        self.connection_class: Type[Connection] = Connection
+
+        # Auth states keyed by session token. Entries are dropped explicitly when a
+        # session or ban changes in this process; the TTL bounds how long other
+        # workers can serve a stale state.
+        self.auth_cache = TTLCache(
+            int(getenv("AUTH_CACHE_SIZE", 4096)),
+            float(getenv("AUTH_CACHE_TTL", 30)),
+        )
+
+        # Single user lookups are batched per event loop tick and cached, and must
+        # be cleared here whenever a Users row changes.
+        self.users = UserLoader(lambda ids: self.get_users(ids, primary=True), TTLCache(
+            int(getenv("USER_CACHE_SIZE", 8192)),
+            float(getenv("USER_CACHE_TTL", 60)),
+        ))
+
+        # Reads that can tolerate replication lag go to a healthy replica, unless the
+        # current user wrote recently and so must read their own writes from the primary.
+        self.replicas = ReplicaSet(
+            [dsn.strip() for dsn in getenv("REPLICA_DSNS", "").split(",") if dsn.strip()],
+            float(getenv("REPLICA_CHECK_INTERVAL", 5)),
+            float(getenv("REPLICA_CHECK_TIMEOUT", 2)),
+            float(getenv("REPLICA_MAX_LAG", 10)),
+        )
+        self.sticky = TTLCache(
+            int(getenv("REPLICA_STICKY_SIZE", 8192)),
+            float(getenv("REPLICA_STICKY_WINDOW", 15)),
+        )
+
+        # Moots by users with fewer followers than this are written into each
+        # follower's timeline when posted; Moots by users with more are read from
+        # the Moots table when a follower loads their timeline instead.
+        self.fanout_threshold = int(getenv("FANOUT_THRESHOLD", 10000))
+        self.timeline_backfill = int(getenv("TIMELINE_BACKFILL", 100))
+
+        # Direct reply counts keyed by Moot ID. A reply handled by this process drops
+        # its parent's count; the TTL bounds how long other workers show an old one.
+        self.reply_counts = TTLCache(
+            int(getenv("REPLY_COUNT_CACHE_SIZE", 8192)),
+            float(getenv("REPLY_COUNT_CACHE_TTL", 30)),
+        )
 
     async def ainit(self) -> None:
         """Asynchronously initialize the database."""
 
-        self.pool = await create_pool(getenv("DB_DSN"))
+        self.pool = await create_pool(getenv("DB_DSN"), connection_class=self.connection_class)
+
+        await self.replicas.start()
+
+    async def close(self) -> None:
+        """Close the replica pools, the worker ID lock connection and the primary pool."""
+
+        await self.replicas.close()
+
+        if self.worker_lock and not self.worker_lock.is_closed():
+            await self.worker_lock.close()
+
+        if self.pool:
+            await self.pool.close()
+
+    def reader(self) -> Pool:
+        """Get the pool to send a lag tolerant read to.
+
+        Returns:
+            Pool: A healthy replica's pool, or the primary's if the current user wrote recently or no replica is healthy.
+        """
+
+        user = current_user.get()
+
+        if user is not None and user in self.sticky:
+            return self.pool
+
+        return self.replicas.choose() or self.pool
+
+    def stick(self, user_id: Optional[int] = None) -> None:
+        """Route a user's reads to the primary for a while after they write.
+
+        Args:
+            user_id (Optional[int]): The user who wrote. Defaults to the current user.
+        """
+
+        user_id = current_user.get() if user_id is None else user_id
+
+        if user_id is not None and len(self.replicas):
+            self.sticky.set(user_id, True)
+
+    def pool_stats(self) -> dict:
+        """Get the connection pool's current size, usage and queue of waiters.
+
+        asyncpg only exposes these through private attributes.
+
+        Returns:
+            dict: The pool's max size, open connections, connections in use, idle connections and waiters.
+        """
+
+        holders = self.pool._holders
+        size = sum(1 for holder in holders if holder._con is not None)
+        in_use = sum(1 for holder in holders if holder._in_use is not None)
+        waiters = sum(1 for waiter in self.pool._queue._getters if not waiter.done())
+
+        return dict(
+            max=self.pool._maxsize,
+            size=size,
+            in_use=in_use,
+            idle=size - in_use,
+            waiters=waiters,
+        )
+
+    async def claim_worker_id(self, count: int, preferred: int = None, on_lost: Callable[[], None] = None, fallback: bool = True) -> int:
+        """Claim a snowflake worker ID no other running process holds.
+
+        The ID is held by an advisory lock on a dedicated connection, so it is
+        released when this process disconnects, or if the connection drops.
+
+        Args:
+            count (int): The number of worker IDs available.
+            preferred (int): An ID to try before the others, such as one held before. Defaults to None.
+            on_lost (Callable[[], None]): Called if the lock connection is closed. Defaults to None.
+            fallback (bool): Whether to try the other IDs if the preferred one is claimed. Defaults to True.
+
+        Returns:
+            int: The claimed worker ID.
+        """
+
+        if not self.worker_lock or self.worker_lock.is_closed():
+            self.worker_lock = await connect(getenv("DB_DSN"))
+
+            if on_lost:
+                self.worker_lock.add_termination_listener(lambda connection: on_lost())
+
+        candidates = list(range(count)) if fallback else []
+
+        if preferred is not None:
+            candidates.insert(0, preferred)
+
+        for id in candidates:
+            if await self.worker_lock.fetchval("SELECT pg_try_advisory_lock($1, $2);", WORKER_LOCK_KEY, id):
+                return id
+
+        if not fallback:
+            raise RuntimeError(f"Snowflake worker ID {preferred} is already claimed by another process.")
+
+        raise RuntimeError("Every snowflake worker ID is already claimed.")
+
+    async def holds_worker_id(self, id: int) -> bool:
+        """Check the lock reserving a snowflake worker ID is still held by this process.
+
+        Args:
+            id (int): The worker ID to check.
+
+        Returns:
+            bool: Whether the lock connection is open and holds the ID's lock.
+        """
+
+        if not self.worker_lock or self.worker_lock.is_closed():
+            return False
+
+        return await self.worker_lock.fetchval(
+            "SELECT EXISTS(SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND pid = pg_backend_pid() "
+            "AND classid = $1::int::oid AND objid = $2::int::oid AND objsubid = 2 AND granted);",
+            WORKER_LOCK_KEY, id,
+        )
 
     async def get_user(self, id: int) -> Optional[User]:
         """Get a user from the database.
@@ -29,12 +216,7 @@ class Database:
             Optional[User]: The user object.
         """
 
-        raw_user = await self.pool.fetchrow("SELECT * FROM Users WHERE id = $1;", id)
-
-        if not raw_user:
-            return None
-
-        return User(**dict(raw_user))
+        return await self.users.load(id)
 
     async def create_user(self, id: int, username: str, avatar: str = None) -> User:
         """Create a new Moot user.
@@ -48,9 +230,12 @@ class Database:
             User: The user object created.
         """
 
-        created_user = await self.pool.fetchrow("INSERT INTO Users (id, username, avatar_hash) VALUES ($1, $2, $3) RETURNING *;", id, username, avatar)
+        created_user = await self.pool.fetchrow(f"INSERT INTO Users (id, username, avatar_hash) VALUES ($1, $2, $3) RETURNING {USER_COLUMNS};", id, username, avatar)
+        user = User.from_record(created_user)
 
-        return User(**dict(created_user))
+        self.users.prime(user)
+
+        return user
 
     async def get_session(self, token: str) -> Optional[Session]:
         """Get a user's existing session.
@@ -62,18 +247,44 @@ class Database:
             Optional[Session]: The user's session.
         """
 
-        raw_session = await self.pool.fetchrow("SELECT * FROM UserSessions WHERE token = $1;", token)
+        raw_session = await self.pool.fetchrow(f"SELECT {SESSION_COLUMNS} FROM UserSessions WHERE token = $1 AND expires >= $2;", token, datetime.utcnow())
 
         if not raw_session:
             return None
 
-        session = Session(**dict(raw_session))
+        return Session.from_record(raw_session)
 
-        if session.expires < datetime.utcnow():
-            await self.pool.execute("DELETE FROM UserSessions WHERE token = $1;", token)
-            return None
+    async def delete_session(self, token: str) -> None:
+        """Delete a user's session.
+
+        Args:
+            token (str): The session token to delete.
+        """
+
+        await self.pool.execute("DELETE FROM UserSessions WHERE token = $1;", token)
+
+        self.auth_cache.pop(token)
+
+    async def sweep_sessions(self, batch: int) -> int:
+        """Delete expired sessions, a bounded batch at a time.
+
+        Args:
+            batch (int): The max number of sessions to delete per statement.
+
+        Returns:
+            int: The number of sessions deleted.
+        """
+
+        deleted = 0
+        now = datetime.utcnow()
 
-        return session
+        while True:
+            status = await self.pool.execute("DELETE FROM UserSessions WHERE token IN (SELECT token FROM UserSessions WHERE expires < $1 LIMIT $2);", now, batch)
+            count = int(status.split()[-1])
+            deleted += count
+
+            if count < batch:
+                return deleted
 
     async def create_session(self, token: str, user: int, expires: datetime) -> Session:
         """Create a new session for a user.
@@ -87,9 +298,9 @@ class Database:
             Session: The session object created.
         """
 
-        created_session = await self.pool.fetchrow("INSERT INTO UserSessions (token, author_id, expires) VALUES ($1, $2, $3) RETURNING *;", token, user, expires)
+        created_session = await self.pool.fetchrow(f"INSERT INTO UserSessions (token, author_id, expires) VALUES ($1, $2, $3) RETURNING {SESSION_COLUMNS};", token, user, expires)
 
-        return Session(**dict(created_session))
+        return Session.from_record(created_session)
 
     async def user_login(self, user_id: int, username: str, avatar: str) -> Session:
         """Execute the full user login process.
@@ -105,6 +316,8 @@ class Database:
 
         expires = datetime.utcnow() + timedelta(days=14)
 
+        self.users.clear(user_id)
+
         user = await self.get_user(user_id)
         if not user:
             user = await self.create_user(user_id, username, avatar)
@@ -121,91 +334,186 @@ class Database:
             AuthState: The user's authentication state.
         """
 
-        session = await self.get_session(token)
-        if not session:
+        if not token:
+            return AuthState()
+
+        cached = self.auth_cache.get(token)
+        if cached:
+            if cached.session.expires >= datetime.utcnow():
+                current_user.set(cached.user.id)
+                return cached
+            self.auth_cache.pop(token)
+
+        raw_auth = await self.pool.fetchrow(
+            f"SELECT s.expires, {JOINED_USER_COLUMNS} "
+            "FROM UserSessions s JOIN Users u ON u.id = s.author_id WHERE s.token = $1 AND s.expires >= $2;",
+            token, datetime.utcnow(),
+        )
+
+        if not raw_auth:
             return AuthState()
 
-        user = await self.get_user(session.author_id)
+        expires = raw_auth[0]
+        user = User.from_record(raw_auth[1:])
+        auth = AuthState(user, Session(token, user.id, expires))
+
+        current_user.set(user.id)
+
+        self.users.prime(user)
+
+        self.auth_cache.set(token, auth, (expires - datetime.utcnow()).total_seconds())
 
-        return AuthState(user, session)
+        return auth
 
-    async def get_moot(self, id: int) -> Optional[Moot]:
+    async def get_moot(self, id: int, primary: bool = False) -> Optional[Moot]:
         """Get a specific Moot by ID.
 
         Args:
             id (int): The ID to fetch the Moot for.
+            primary (bool): Whether to read from the primary instead of a replica. Defaults to False.
 
         Returns:
             Optional[Moot]: The Moot object.
         """
 
-        raw_moot = await self.pool.fetchrow("SELECT * FROM Moots WHERE id = $1;", id)
+        raw_moot = await (self.pool if primary else self.reader()).fetchrow(f"SELECT {MOOT_COLUMNS} FROM Moots WHERE id = $1;", id)
 
         if not raw_moot:
             return None
 
-        return Moot(**dict(raw_moot))
+        return Moot.from_record(raw_moot)
 
-    async def get_recent_moots(self, userid: int, number: int, offset: int = 0) -> List[Moot]:
-        """Get the most recent moots from a user.
+    async def get_moot_with_author(self, id: int, primary: bool = False) -> Optional[Tuple[Moot, User]]:
+        """Get a specific Moot and its author in one query.
+
+        Args:
+            id (int): The ID to fetch the Moot for.
+            primary (bool): Whether to read from the primary instead of a replica. Defaults to False.
+
+        Returns:
+            Optional[Tuple[Moot, User]]: The Moot and its author.
+        """
+
+        raw = await (self.pool if primary else self.reader()).fetchrow(
+            f"SELECT {JOINED_MOOT_COLUMNS}, {JOINED_USER_COLUMNS} FROM Moots m JOIN Users u ON u.id = m.author_id WHERE m.id = $1;",
+            id,
+        )
+
+        if not raw:
+            return None
+
+        return Moot.from_record(raw[:MOOT_FIELDS]), User.from_record(raw[MOOT_FIELDS:])
+
+    async def get_recent_moots(self, userid: int, number: int, before: int = None, after: int = None, preview: bool = False) -> List[Moot]:
+        """Get the most recent moots from a user, newest first.
 
         Args:
             userid (int): The user's ID to query Moots from.
             number (int): The max number of Moots to return.
-            offset (int): The offset to fetch Moots at. Defaults to 0.
+            before (int): Only return Moots older than this ID. Defaults to None.
+            after (int): Only return the Moots directly newer than this ID. Defaults to None.
+            preview (bool): Whether to fetch only each Moot's preview, not its full content. Defaults to False.
+            primary (bool): Whether to read from the primary instead of a replica. Defaults to False.
 
         Returns:
             List[Moot]: The list of Moots.
         """
 
-        moots = await self.pool.fetch("SELECT * FROM Moots WHERE author_id = $1 ORDER BY id DESC LIMIT $2 OFFSET $3;", userid, number, offset)
+        columns = PREVIEW_MOOT_COLUMNS if preview else MOOT_COLUMNS
+        pool = self.pool if primary else self.reader()
+
+        if after is not None:
+            moots = await pool.fetch(f"SELECT * FROM (SELECT {columns} FROM Moots WHERE author_id = $1 AND id > $3 ORDER BY id ASC LIMIT $2) m ORDER BY id DESC;", userid, number, after)
+        else:
+            moots = await self.reader().fetch(f"SELECT {columns} FROM Moots WHERE author_id = $1 AND id < $3 ORDER BY id DESC LIMIT $2;", userid, number, MAX_ID if before is None else before)
 
-        return [Moot(**dict(raw_moot)) for raw_moot in moots]
+        return [Moot.from_record(raw_moot) for raw_moot in moots]
 
-    async def get_all_recent_moots(self, number: int, offset: int = 0) -> List[Moot]:
-        """Get the most recent moots.
+    async def get_all_recent_moots(self, number: int, before: int = None, after: int = None, preview: bool = False, primary: bool = False) -> List[Moot]:
+        """Get the most recent moots, newest first.
 
         Args:
             number (int): The max number of Moots to return.
-            offset (int): The offset to fetch Moots at. Defaults to 0.
+            before (int): Only return Moots older than this ID. Defaults to None.
+            after (int): Only return the Moots directly newer than this ID. Defaults to None.
+            preview (bool): Whether to fetch only each Moot's preview, not its full content. Defaults to False.
+            primary (bool): Whether to read from the primary instead of a replica. Defaults to False.
 
         Returns:
             List[Moot]: The list of Moots.
         """
 
-        moots = await self.pool.fetch("SELECT * FROM Moots ORDER BY id DESC LIMIT $1 OFFSET $2;", number, offset)
+        columns = PREVIEW_MOOT_COLUMNS if preview else MOOT_COLUMNS
+        pool = self.pool if primary else self.reader()
 
-        return [Moot(**dict(raw_moot)) for raw_moot in moots]
+        if after is not None:
+            moots = await pool.fetch(f"SELECT * FROM (SELECT {columns} FROM Moots WHERE id > $2 ORDER BY id ASC LIMIT $1) m ORDER BY id DESC;", number, after)
+        else:
+            moots = await pool.fetch(f"SELECT {columns} FROM Moots WHERE id < $2 ORDER BY id DESC LIMIT $1;", number, MAX_ID if before is None else before)
 
-    async def get_users(self, ids: List[int]) -> List[User]:
+        return [Moot.from_record(raw_moot) for raw_moot in moots]
+
+    async def get_users(self, ids: List[int], primary: bool = False) -> List[User]:
         """Get a user from the database.
 
         Args:
             ids (List[int]): The user IDs to look up.
+            primary (bool): Whether to read from the primary instead of a replica. Defaults to False.
 
         Returns:
             List[User]: The user objects.
         """
 
-        raw_users = await self.pool.fetch("SELECT * FROM Users WHERE id = any($1::bigint[]);", tuple(ids))
+        raw_users = await (self.pool if primary else self.reader()).fetch(f"SELECT {USER_COLUMNS} FROM Users WHERE id = any($1::bigint[]);", tuple(ids))
 
-        return [User(**dict(raw_user)) for raw_user in raw_users]
+        return [User.from_record(raw_user) for raw_user in raw_users]
 
-    async def create_moot(self, id: int, author_id: int, content: str) -> Moot:
-        """Create a new Moot.
+    async def create_moot(self, id: int, author_id: int, content: str, reference: int = None) -> Moot:
+        """Create a new Moot, adding it to the author's timeline and, unless they have too many followers, their followers' timelines.
 
         Args:
             id (int): The ID of the Moot to create.
             author_id (int): The author of the Moot's ID.
             content (str): The content of the moot.
+            reference (int): The ID of the Moot this replies to, if any. Defaults to None.
 
         Returns:
             Moot: The created Moot object.
         """
 
-        created_moot = await self.pool.fetchrow("INSERT INTO Moots (id, author_id, content) VALUES ($1, $2, $3) RETURNING *;", id, author_id, content)
+        created_moot = await self.pool.fetchrow(
+            "WITH moot AS ("
+            f"INSERT INTO Moots (id, author_id, content, preview, truncated, content_length, reference) VALUES ($1, $2, $3, $4, $5, $6, $8) RETURNING {MOOT_COLUMNS}"
+            "), fanout AS ("
+            "INSERT INTO Timelines (user_id, moot_id) SELECT $2, $1 UNION ALL "
+            "SELECT f.follower_id, $1 FROM Follows f JOIN Users u ON u.id = f.followee_id WHERE f.followee_id = $2 AND u.follower_count < $7 "
+            "ON CONFLICT DO NOTHING"
+            f") SELECT {MOOT_COLUMNS} FROM moot;",
+            id, author_id, content, *make_preview(content), self.fanout_threshold, reference,
+        )
+
+        if reference is not None:
+            self.reply_counts.pop(reference)
 
-        return Moot(**dict(created_moot))
+        self.stick(author_id)
+
+        return Moot.from_record(created_moot)
+
+    async def bulk_create_moots(self, moots: List[tuple]) -> None:
+        """Create many Moots with a single COPY, building their previews.
+
+        Args:
+            moots (List[tuple]): The (id, author_id, content, reference, hide) rows to create.
+        """
+
+        records = [(*moot, *make_preview(moot[2])) for moot in moots]
+
+        # asyncpg 0.22 pools can't COPY, only their connections can.
+        async with self.pool.acquire() as connection:
+            await connection.copy_records_to_table(
+                "moots", records=records,
+                columns=("id", "author_id", "content", "reference", "hide", "preview", "truncated", "content_length"),
+            )
 
     async def delete_moot(self, id: int) -> None:
         """Delete a Moot.
@@ -216,6 +524,8 @@ class Database:
 
         await self.pool.execute("DELETE FROM Moots WHERE id = $1;", id)
 
+        self.stick()
+
     async def hide_moot(self, id: int) -> None:
         """Hide a Moot.
 
@@ -225,19 +535,68 @@ class Database:
 
         await self.pool.execute("UPDATE Moots SET hide = true WHERE id = $1;", id)
 
-    async def search_users(self, query: str) -> List[User]:
-        """Search for users matching a given pattern.
+        self.stick()
+
+    async def search_users(self, query: str, number: int = 20, offset: int = 0) -> List[User]:
+        """Search for users whose username contains a query, best matches first.
 
         Args:
-            query (str): The query pattern to search for.
+            query (str): The text to search usernames for.
+            number (int): The max number of users to return. Defaults to 20.
+            offset (int): The offset to fetch users at. Defaults to 0.
 
         Returns:
             List[User]: The users found by the query.
         """
 
-        raw_users = await self.pool.fetch("SELECT * FROM Users WHERE username LIKE $1;", f"%{query}%")
+        raw_users = await self.reader().fetch(
+            f"SELECT {USER_COLUMNS} FROM Users WHERE username ILIKE $1 ORDER BY similarity(username, $2) DESC, id LIMIT $3 OFFSET $4;",
+            f"%{escape_like(query)}%", query, number, offset,
+        )
+
+        return [User.from_record(raw_user) for raw_user in raw_users]
+
+    async def search_usernames(self, prefix: str, number: int = 10) -> List[User]:
+        """Get the users whose username starts with a prefix.
+
+        Args:
+            prefix (str): The prefix to search usernames for.
+            number (int): The max number of users to return. Defaults to 10.
+
+        Returns:
+            List[User]: The users found, shortest usernames first.
+        """
+
+        raw_users = await self.reader().fetch(
+            f"SELECT {USER_COLUMNS} FROM Users WHERE username ILIKE $1 ORDER BY char_length(username), username LIMIT $2;",
+            f"{escape_like(prefix)}%", number,
+        )
+
+        return [User.from_record(raw_user) for raw_user in raw_users]
+
+    async def search_moots(self, query: str, number: int, before: Tuple[float, int] = None) -> List[Tuple[Moot, float]]:
+        """Search the content of visible Moots, best matches first.
+
+        Args:
+            query (str): The search query, in websearch syntax.
+            number (int): The max number of Moots to return.
+            before (Tuple[float, int]): Only return Moots ranked after this (rank, id) cursor. Defaults to None.
+
+        Returns:
+            List[Tuple[Moot, float]]: The previews of the Moots found, with their ranks.
+        """
+
+        rank, id = before or (float("inf"), MAX_ID)
+
+        raw_moots = await self.reader().fetch(
+            f"SELECT {PREVIEW_MOOT_COLUMNS}, rank FROM ("
+            "SELECT m.*, ts_rank(m.content_tsv, q) AS rank FROM Moots m, websearch_to_tsquery('english', $1) q "
+            "WHERE m.content_tsv @@ q AND NOT m.hide"
+            ") r WHERE (rank, id) < ($3, $4) ORDER BY rank DESC, id DESC LIMIT $2;",
+            query, number, rank, id,
+        )
 
-        return [User(**dict(raw_user)) for raw_user in raw_users]
+        return [(Moot.from_record(raw_moot[:-1]), raw_moot[-1]) for raw_moot in raw_moots]
 
     async def set_banned(self, user_id: int, state: bool) -> None:
         """Ban or unban a user.
@@ -248,3 +607,254 @@ class Database:
         """
 
         await self.pool.execute("UPDATE Users SET banned = $1 WHERE id = $2;", state, user_id)
+
+        self.auth_cache.evict(lambda auth: auth.user.id == user_id)
+        self.users.clear(user_id)
+        self.stick()
+
+    async def hide_moots(self, ids: List[int]) -> List[int]:
+        """Hide many Moots in one statement.
+
+        Args:
+            ids (List[int]): The IDs of the Moots to hide.
+
+        Returns:
+            List[int]: The IDs of the Moots which were hidden.
+        """
+
+        hidden = await self.pool.fetch("UPDATE Moots SET hide = true WHERE id = any($1::bigint[]) AND NOT hide RETURNING id;", ids)
+
+        self.stick()
+
+        return [row[0] for row in hidden]
+
+    async def delete_moots(self, ids: List[int]) -> List[int]:
+        """Delete many Moots in one statement.
+
+        Args:
+            ids (List[int]): The IDs of the Moots to delete.
+
+        Returns:
+            List[int]: The IDs of the Moots which were deleted.
+        """
+
+        deleted = await self.pool.fetch("DELETE FROM Moots WHERE id = any($1::bigint[]) RETURNING id;", ids)
+
+        self.stick()
+
+        return [row[0] for row in deleted]
+
+    async def ban_and_purge(self, user_id: int) -> Optional[List[int]]:
+        """Ban a user, hide all their Moots and revoke all their sessions in one transaction.
+
+        Args:
+            user_id (int): The user to action.
+
+        Returns:
+            Optional[List[int]]: The IDs of the Moots which were hidden, or None if the user doesn't exist.
+        """
+
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                if not await connection.fetchval("UPDATE Users SET banned = true WHERE id = $1 RETURNING id;", user_id):
+                    return None
+
+                hidden = await connection.fetch("UPDATE Moots SET hide = true WHERE author_id = $1 AND NOT hide RETURNING id;", user_id)
+                await connection.execute("DELETE FROM UserSessions WHERE author_id = $1;", user_id)
+
+        self.auth_cache.evict(lambda auth: auth.user.id == user_id)
+        self.users.clear(user_id)
+        self.stick()
+
+        return [row[0] for row in hidden]
+
+    async def follow(self, follower_id: int, followee_id: int) -> bool:
+        """Follow a user, adding their recent Moots to the follower's timeline.
+
+        Args:
+            follower_id (int): The user following.
+            followee_id (int): The user to follow.
+
+        Returns:
+            bool: Whether the follow is new.
+        """
+
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                if not await connection.fetchval("INSERT INTO Follows (follower_id, followee_id) VALUES ($1, $2) ON CONFLICT DO NOTHING RETURNING true;", follower_id, followee_id):
+                    return False
+
+                followers = await connection.fetchval("UPDATE Users SET follower_count = follower_count + 1 WHERE id = $1 RETURNING follower_count;", followee_id)
+
+                if followers < self.fanout_threshold:
+                    await connection.execute(
+                        "INSERT INTO Timelines (user_id, moot_id) SELECT $1, id FROM Moots WHERE author_id = $2 ORDER BY id DESC LIMIT $3 ON CONFLICT DO NOTHING;",
+                        follower_id, followee_id, self.timeline_backfill,
+                    )
+
+        self.users.clear(followee_id)
+        self.stick(follower_id)
+
+        return True
+
+    async def unfollow(self, follower_id: int, followee_id: int) -> bool:
+        """Unfollow a user, removing their Moots from the follower's timeline.
+
+        Args:
+            follower_id (int): The user unfollowing.
+            followee_id (int): The user to unfollow.
+
+        Returns:
+            bool: Whether the follower was following the user.
+        """
+
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                if not await connection.fetchval("DELETE FROM Follows WHERE follower_id = $1 AND followee_id = $2 RETURNING true;", follower_id, followee_id):
+                    return False
+
+                await connection.execute("UPDATE Users SET follower_count = follower_count - 1 WHERE id = $1;", followee_id)
+                await connection.execute(
+                    "DELETE FROM Timelines t USING Moots m WHERE t.user_id = $1 AND m.id = t.moot_id AND m.author_id = $2;",
+                    follower_id, followee_id,
+                )
+
+        self.users.clear(followee_id)
+        self.stick(follower_id)
+
+        return True
+
+    async def is_following(self, follower_id: int, followee_id: int) -> bool:
+        """Check whether one user follows another.
+
+        Args:
+            follower_id (int): The possible follower.
+            followee_id (int): The possibly followed user.
+
+        Returns:
+            bool: Whether the follow exists.
+        """
+
+        return bool(await self.reader().fetchval("SELECT true FROM Follows WHERE follower_id = $1 AND followee_id = $2;", follower_id, followee_id))
+
+    async def get_timeline(self, user_id: int, number: int, before: int = None, after: int = None) -> List[Tuple[Moot, User]]:
+        """Get the previews of a user's home timeline, newest first, with their authors.
+
+        Moots fanned out to the user are read from their timeline. Moots by followed users
+        with too many followers to fan out to are merged in from the Moots table. A user
+        who drops back under the threshold leaves the Moots they posted while over it out
+        of their followers' timelines.
+
+        Args:
+            user_id (int): The user whose timeline to get.
+            number (int): The max number of Moots to return.
+            before (int): Only return Moots older than this ID. Defaults to None.
+            after (int): Only return the Moots directly newer than this ID. Defaults to None.
+
+        Returns:
+            List[Tuple[Moot, User]]: The Moots and their authors.
+        """
+
+        if after is not None:
+            compare, order, bound = ">", "ASC", after
+        else:
+            compare, order, bound = "<", "DESC", MAX_ID if before is None else before
+
+        raw = await self.reader().fetch(
+            f"SELECT {JOINED_PREVIEW_MOOT_COLUMNS}, {JOINED_USER_COLUMNS} FROM ("
+            f"(SELECT moot_id AS id FROM Timelines WHERE user_id = $1 AND moot_id {compare} $3 ORDER BY moot_id {order} LIMIT $2) UNION "
+            "(SELECT l.id FROM Follows f JOIN Users s ON s.id = f.followee_id CROSS JOIN LATERAL ("
+            f"SELECT id FROM Moots WHERE author_id = f.followee_id AND id {compare} $3 ORDER BY id {order} LIMIT $2"
+            ") l WHERE f.follower_id = $1 AND s.follower_count >= $4) "
+            f"ORDER BY id {order} LIMIT $2"
+            ") t JOIN Moots m ON m.id = t.id JOIN Users u ON u.id = m.author_id ORDER BY m.id DESC;",
+            user_id, number, bound, self.fanout_threshold,
+        )
+
+        return [(Moot.from_record(row[:MOOT_FIELDS]), User.from_record(row[MOOT_FIELDS:])) for row in raw]
+
+    async def sweep_timelines(self, retention: float, batch: int) -> int:
+        """Delete timeline entries for Moots older than the retention period, a bounded batch at a time.
+
+        Args:
+            retention (float): The seconds a Moot stays in timelines for.
+            batch (int): The max number of entries to delete per statement.
+
+        Returns:
+            int: The number of entries deleted.
+        """
+
+        deleted = 0
+        cutoff = first_id_at(time() - retention)
+
+        while True:
+            status = await self.pool.execute(
+                "DELETE FROM Timelines WHERE (user_id, moot_id) IN (SELECT user_id, moot_id FROM Timelines WHERE moot_id < $1 LIMIT $2);",
+                cutoff, batch,
+            )
+            count = int(status.split()[-1])
+            deleted += count
+
+            if count < batch:
+                return deleted
+
+    async def get_thread(self, id: int, depth: int, size: int) -> Tuple[List[Tuple[Moot, User, int]], bool]:
+        """Get the previews of the replies to a Moot, their replies and so on, with their authors.
+
+        Replies are walked breadth first, so when the size limit is hit it is the
+        deepest replies which are left out.
+
+        Args:
+            id (int): The ID of the Moot at the top of the thread.
+            depth (int): The max number of levels of replies to return.
+            size (int): The max number of replies to return.
+
+        Returns:
+            Tuple[List[Tuple[Moot, User, int]], bool]: The replies, their authors and their depths below the Moot, in thread order, and whether any were left out.
+        """
+
+        # The Moot itself is the first row walked, and one reply past the limit shows
+        # whether the thread was cut short.
+        raw = await self.reader().fetch(
+            "WITH RECURSIVE thread AS ("
+            "SELECT id, 0 AS depth, ARRAY[id] AS path FROM Moots WHERE id = $1 UNION ALL "
+            "SELECT m.id, t.depth + 1, t.path || m.id FROM thread t JOIN Moots m ON m.reference = t.id WHERE t.depth < $2"
+            f") SELECT {JOINED_PREVIEW_MOOT_COLUMNS}, {JOINED_USER_COLUMNS}, t.depth, t.n FROM (SELECT *, row_number() OVER () AS n FROM thread LIMIT $3) t "
+            "JOIN Moots m ON m.id = t.id JOIN Users u ON u.id = m.author_id WHERE t.depth > 0 ORDER BY t.path;",
+            id, depth, size + 2,
+        )
+
+        replies = [(Moot.from_record(row[:MOOT_FIELDS]), User.from_record(row[MOOT_FIELDS:-2]), row[-2]) for row in raw if row[-1] <= size + 1]
+
+        return replies, len(replies) < len(raw)
+
+    async def get_reply_counts(self, ids: List[int]) -> Dict[int, int]:
+        """Get how many direct replies each of a list of Moots has.
+
+        Args:
+            ids (List[int]): The IDs of the Moots to count replies to.
+
+        Returns:
+            Dict[int, int]: The reply count of each Moot.
+        """
+
+        counts = {}
+        missing = []
+
+        for id in ids:
+            count = self.reply_counts.get(id)
+
+            if count is None:
+                missing.append(id)
+            else:
+                counts[id] = count
+
+        if missing:
+            raw = await self.reader().fetch("SELECT reference, count(*) FROM Moots WHERE reference = any($1::bigint[]) GROUP BY reference;", missing)
+            found = dict(raw)
+
+            for id in missing:
+                counts[id] = found.get(id, 0)
+                self.reply_counts.set(id, counts[id])
+
+        return counts
@@ -1,24 +1,67 @@
 from os import getenv
-from typing import Optional
+from typing import Optional, Tuple
 from datetime import datetime
 from dataclasses import dataclass, field
 
 from fastapi.exceptions import HTTPException
 from fastapi.responses import RedirectResponse
-from pydantic import BaseModel, constr
+from pydantic import BaseModel, conlist, constr
 
 from .bitfield import BitField
 from .ids import get_datetime
 
 
+# The column lists each model's from_record expects, in field order.
+USER_COLUMNS = "id, username, avatar_hash, bio, banned, flags, follower_count"
+MOOT_COLUMNS = "id, author_id, content, reference, hide, flags, preview, truncated, content_length"
+SESSION_COLUMNS = "token, author_id, expires"
+
+# Feeds only show a preview, so they select it in place of the full content.
+PREVIEW_MOOT_COLUMNS = "id, author_id, NULL::text AS content, reference, hide, flags, preview, truncated, content_length"
+
+# A preview is at most this many characters and lines of a Moot's content.
+PREVIEW_CHARS = 1024
+PREVIEW_LINES = 20
+
+
+def make_preview(content: str) -> Tuple[str, bool, int]:
+    """Build a Moot's stored preview.
+
+    Args:
+        content (str): The Moot's full content.
+
+    Returns:
+        Tuple[str, bool, int]: The preview, whether it is shorter than the content, and the content's length.
+    """
+
+    preview = "\n".join(content[:PREVIEW_CHARS].split("\n")[:PREVIEW_LINES])
+
+    return preview, preview != content, len(content)
+
+
 @dataclass
 class User:
+    __slots__ = ("id", "username", "avatar_hash", "bio", "banned", "flags", "follower_count", "admin", "can_paste")
+
     id: int
     username: str
     avatar_hash: Optional[str]
     bio: Optional[str]
     banned: bool
     flags: int
+    follower_count: int
+
+    def __post_init__(self) -> None:
+        bits = BitField(self.flags)
+
+        self.admin = bool(bits[0])
+        self.can_paste = bool(bits[1])
+
+    @classmethod
+    def from_record(cls, record) -> "User":
+        """Build a user from a record selected with USER_COLUMNS."""
+
+        return cls(*record)
 
     @property
     def avatar_url(self) -> str:
@@ -28,14 +71,6 @@ class User:
     def bits(self) -> BitField:
         return BitField(self.flags)
 
-    @property
-    def admin(self) -> bool:
-        return bool(self.bits[0])
-
-    @property
-    def can_paste(self) -> bool:
-        return bool(self.bits[1])
-
     @property
     def userbio(self) -> str:
         return self.bio or "This user has no bio."
@@ -49,18 +84,37 @@ class User:
             banned=self.banned,
         )
 
+    @property
+    def public(self) -> dict:
+        return dict(
+            id=self.id,
+            username=self.username,
+            avatar_url=self.avatar_url,
+        )
+
     def raise_banned(self) -> None:
         if self.banned and not self.admin: raise HTTPException(403, "You are banned.")
 
 
 @dataclass
 class Moot:
+    __slots__ = ("id", "author_id", "content", "reference", "hide", "flags", "preview", "truncated", "content_length")
+
     id: int
     author_id: int
-    content: str
+    content: Optional[str]
     reference: Optional[int]
     hide: bool
     flags: int
+    preview: str
+    truncated: bool
+    content_length: int
+
+    @classmethod
+    def from_record(cls, record) -> "Moot":
+        """Build a Moot from a record selected with MOOT_COLUMNS or PREVIEW_MOOT_COLUMNS."""
+
+        return cls(*record)
 
     @property
     def human_time(self) -> str:
@@ -75,10 +129,18 @@ class Moot:
 
 @dataclass
 class Session:
+    __slots__ = ("token", "author_id", "expires")
+
     token: str
     author_id: int
     expires: datetime
 
+    @classmethod
+    def from_record(cls, record) -> "Session":
+        """Build a session from a record selected with SESSION_COLUMNS."""
+
+        return cls(*record)
+
 
 @dataclass
 class AuthState:
@@ -98,9 +160,16 @@ class ResolvedMoot:
     @property
     def content(self) -> str:
         if self.use_sample:
-            return "\n".join(self.moot._content[:1024].split("\n")[:20]) + ("..." if len(self.moot._content) > 1024 else "")
+            if self.moot.hide:
+                return self.moot._content
+            return self.moot.preview + ("..." if self.moot.content_length > PREVIEW_CHARS else "")
         return self.moot._content
 
 
 class NewPost(BaseModel):
     content: constr(max_length=32000)
+    reference: Optional[int] = None
+
+
+class BulkModeration(BaseModel):
+    ids: conlist(int, min_items=1, max_items=1000)
@@ -0,0 +1,146 @@
+from os import getenv
+from time import monotonic
+from asyncio import Lock
+from collections import deque
+from functools import partial
+from typing import Callable, List, Optional
+
+from .datamodels import Moot, ResolvedMoot, User
+
+
+class Feed:
+    """An in-memory ring buffer of the newest Moots, with their authors resolved.
+
+    Every worker process keeps its own buffer. Creates, deletes and hides handled
+    by a worker are applied to its buffer straight away, so a user always sees
+    their own actions. Changes made by other workers are only picked up when the
+    buffer is rebuilt from the database, which happens at most `refresh` seconds
+    after the last rebuild. With several workers a new Moot may therefore take up
+    to `refresh` seconds to show on every worker, and a hidden or deleted Moot may
+    be served by other workers for as long.
+    """
+
+    def __init__(self, db, size: int = None, refresh: float = None) -> None:
+        self.db = db
+        self.size = size or int(getenv("FEED_SIZE", 50))
+        self.refresh = refresh or float(getenv("FEED_REFRESH", 10))
+
+        self.moots: deque = deque(maxlen=self.size)
+
+        self._loaded_at: Optional[float] = None
+        self._lock = Lock()
+
+        # Changes made while a reload is in flight, replayed onto the new buffer since
+        # its snapshot may have been taken before them.
+        self._changes: Optional[List[Callable[[], None]]] = None
+
+    @property
+    def stale(self) -> bool:
+        return self._loaded_at is None or monotonic() - self._loaded_at > self.refresh
+
+    async def reload(self) -> None:
+        """Rebuild the buffer from the database."""
+
+        self._changes = []
+
+        try:
+            # The buffer is shared by every request this worker serves, so it is read from
+            # the primary: a lagging replica would bring back hidden Moots and drop new ones.
+            moots = await self.db.get_all_recent_moots(self.size, preview=True, primary=True)
+            users = await self.db.get_users(list(set([moot.author_id for moot in moots])), primary=True)
+            users = {user.id: user for user in users}
+
+            self.moots = deque(
+                [ResolvedMoot(users[moot.author_id], moot, use_sample=True) for moot in moots],
+                maxlen=self.size,
+            )
+            self._loaded_at = monotonic()
+
+            for change in self._changes:
+                change()
+        finally:
+            self._changes = None
+
+    async def latest(self, number: int) -> List[ResolvedMoot]:
+        """Get the newest Moots, rebuilding the buffer first if it is stale.
+
+        Args:
+            number (int): The max number of Moots to return.
+
+        Returns:
+            List[ResolvedMoot]: The newest Moots, newest first.
+        """
+
+        if self.stale:
+            async with self._lock:
+                if self.stale:
+                    await self.reload()
+
+        return [moot for _, moot in zip(range(number), self.moots)]
+
+    def add(self, user: User, moot: Moot) -> None:
+        """Add a newly created Moot to the buffer, in ID order.
+
+        Args:
+            user (User): The Moot's author.
+            moot (Moot): The created Moot.
+        """
+
+        self._apply(partial(self._insert, ResolvedMoot(user, moot, use_sample=True)))
+
+    def remove(self, id: int) -> None:
+        """Remove a deleted Moot from the buffer.
+
+        Args:
+            id (int): The ID of the deleted Moot.
+        """
+
+        self._apply(partial(self._remove, id))
+
+    def hide(self, id: int) -> None:
+        """Mark a Moot in the buffer as hidden.
+
+        Args:
+            id (int): The ID of the hidden Moot.
+        """
+
+        self._apply(partial(self._hide, id))
+
+    def _apply(self, change: Callable[[], None]) -> None:
+        change()
+
+        if self._changes is not None:
+            self._changes.append(change)
+
+    def _insert(self, resolved: ResolvedMoot) -> None:
+        # Another worker's Moot from the same millisecond, or one loaded by a reload,
+        # can sort above a new one, so it can't just go on the front.
+        index = 0
+
+        for index, moot in enumerate(self.moots):
+            if moot.moot.id == resolved.moot.id:
+                return
+            if moot.moot.id < resolved.moot.id:
+                break
+        else:
+            index = len(self.moots)
+
+        if len(self.moots) == self.size:
+            if index == self.size:
+                return
+
+            self.moots.pop()
+
+        self.moots.insert(index, resolved)
+
+    def _remove(self, id: int) -> None:
+        for moot in self.moots:
+            if moot.moot.id == id:
+                self.moots.remove(moot)
+                return
+
+    def _hide(self, id: int) -> None:
+        for moot in self.moots:
+            if moot.moot.id == id:
+                moot.moot.hide = True
+                return
@@ -0,0 +1,76 @@
+from os import getenv
+from itertools import product
+from collections import OrderedDict
+
+from jinja2 import Environment
+from markupsafe import Markup
+
+from .datamodels import ResolvedMoot, User
+
+
+class FragmentCache:
+    """An LRU cache of rendered `makemoot` fragments, capped by total length.
+
+    Fragments are keyed by the Moot's ID, hide state, preview mode and whether the
+    viewer is an admin, which is everything the macro's output depends on.
+    """
+
+    def __init__(self, env: Environment, max_size: int = None) -> None:
+        self.env = env
+
+        self.size = 0
+        self._max_size = max_size
+        self._data: OrderedDict = OrderedDict()
+
+    @property
+    def max_size(self) -> int:
+        # Read on first use rather than at import, which happens before main.py loads .env.
+        if self._max_size is None:
+            self._max_size = int(getenv("FRAGMENT_CACHE_SIZE", 32 * 1024 * 1024))
+
+        return self._max_size
+
+    def render(self, moot: ResolvedMoot, user: User) -> Markup:
+        """Render a Moot with the `makemoot` macro, reusing a cached fragment if possible.
+
+        Args:
+            moot (ResolvedMoot): The Moot to render.
+            user (User): The logged in user viewing the Moot.
+
+        Returns:
+            Markup: The rendered Moot.
+        """
+
+        key = (moot.moot.id, moot.moot.hide, moot.use_sample, bool(user.admin))
+        fragment = self._data.get(key)
+
+        if fragment is not None:
+            self._data.move_to_end(key)
+            return fragment
+
+        fragment = self.env.get_template("moot.html").module.makemoot(moot, user)
+
+        if len(fragment) > self.max_size:
+            return fragment
+
+        self._data[key] = fragment
+        self.size += len(fragment)
+
+        while self.size > self.max_size:
+            _, evicted = self._data.popitem(last=False)
+            self.size -= len(evicted)
+
+        return fragment
+
+    def evict(self, id: int) -> None:
+        """Remove every cached fragment of a Moot.
+
+        Args:
+            id (int): The ID of the Moot to evict.
+        """
+
+        for hide, use_sample, admin in product((False, True), repeat=3):
+            fragment = self._data.pop((id, hide, use_sample, admin), None)
+
+            if fragment is not None:
+                self.size -= len(fragment)
@@ -1,15 +1,109 @@
-from time import time
+from os import getenv, getpid
+from time import sleep, time
 from datetime import datetime
+from typing import List, Optional
+
+
+EPOCH = 1609459200000
+
+WORKER_BITS = 8
+INCREMENT_BITS = 6
+
+MAX_WORKER = (1 << WORKER_BITS) - 1
+MAX_INCREMENT = (1 << INCREMENT_BITS) - 1
+
+# How many milliseconds ahead of the clock a generator may borrow. Anything issued
+# ahead of the clock could be issued again by a process that takes over the worker
+# ID, so this bounds that window.
+MAX_DRIFT = 4
+
+
+class NoWorkerID(RuntimeError):
+    """Raised when IDs are requested while the generator holds no worker ID."""
 
 
 class IDGenerator():
-    def __init__(self):
+    """A snowflake generator, unique per worker ID.
+
+    Each millisecond holds 64 increments; once they run out, or if the clock moves
+    backwards a little, the generator borrows the next millisecond after the last
+    one it used rather than reissuing old IDs. It only sleeps once it would get more
+    than MAX_DRIFT milliseconds ahead of the clock. Its worker may be set to None
+    while no worker ID is held, in which case no IDs are issued.
+    """
+
+    def __init__(self, worker: int = None):
+        if worker is None:
+            worker = int(getenv("WORKER_ID", getpid() % (MAX_WORKER + 1)))
+
+        self.worker = worker
+        self.last = -1
         self.inc = 0
 
-    def next(self):
-        t = round(time() * 1000) - 1609459200000
-        self.inc += 1
-        return ((t << 14) | (1 << 6) | (self.inc % 2**6))
+    @property
+    def worker(self) -> Optional[int]:
+        return self._worker
+
+    @worker.setter
+    def worker(self, worker: Optional[int]) -> None:
+        if worker is not None and not 0 <= worker <= MAX_WORKER:
+            raise ValueError(f"Worker ID must be between 0 and {MAX_WORKER}.")
+        self._worker = worker
+
+    def _timestamp(self) -> int:
+        return int(time() * 1000) - EPOCH
+
+    def _tick(self) -> None:
+        while True:
+            now = self._timestamp()
+
+            if now > self.last:
+                self.last = now
+                self.inc = 0
+            elif self.inc < MAX_INCREMENT:
+                self.inc += 1
+            elif self.last - now < MAX_DRIFT:
+                self.last += 1
+                self.inc = 0
+            else:
+                sleep((self.last - now - MAX_DRIFT + 1) / 1000)
+                continue
+
+            return
+
+    def next(self) -> int:
+        if self._worker is None:
+            raise NoWorkerID("No snowflake worker ID is held.")
+
+        self._tick()
+        return (self.last << 14) | (self._worker << 6) | self.inc
+
+    def next_many(self, n: int) -> List[int]:
+        """Get n IDs, taking whole runs of increments at a time.
+
+        Args:
+            n (int): The number of IDs to generate.
+
+        Returns:
+            List[int]: The IDs, in ascending order.
+        """
+
+        ids = []
+
+        while len(ids) < n:
+            first = self.next()
+            take = min(n - len(ids) - 1, MAX_INCREMENT - self.inc)
+
+            ids.extend(range(first, first + take + 1))
+            self.inc += take
+
+        return ids
+
+
+def first_id_at(timestamp: float) -> int:
+    """Get the lowest snowflake that could be generated at a UNIX timestamp in seconds."""
+
+    return (int(timestamp * 1000) - EPOCH) << 14
 
 
 def decode_sf(sf: int) -> tuple:
@@ -22,4 +116,4 @@ def decode_sf(sf: int) -> tuple:
 def get_datetime(sf: int) -> datetime:
     timestamp, _, __ = decode_sf(sf)
 
-    return datetime.fromtimestamp((timestamp + 1609459200000) / 1000)
+    return datetime.fromtimestamp((timestamp + EPOCH) / 1000)
@@ -0,0 +1,123 @@
+"""Bulk import Moots from a JSONL file.
+
+    python -m src.utils.ingest moots.jsonl [--batch-size 5000]
+
+Each line is an object with an `author_id` and `content`, and optionally a
+`reference` and `hide`. Lines which fail validation are skipped and reported.
+"""
+
+from sys import stderr
+from json import loads
+from asyncio import run
+from time import perf_counter
+from argparse import ArgumentParser
+from typing import Iterable, Iterator, List, Tuple
+
+from dotenv import load_dotenv
+
+from .ids import IDGenerator, MAX_WORKER
+from .database import Database
+
+
+MIN_LENGTH = 280
+MAX_LENGTH = 32000
+
+
+def parse(lines: Iterable[str]) -> Iterator[Tuple[int, int, str, int, bool]]:
+    """Parse and validate JSONL Moots, yielding (line number, author, content, reference, hide)."""
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+
+        try:
+            data = loads(line)
+            author_id, content = int(data["author_id"]), data["content"]
+            reference = data.get("reference")
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"line {number}: skipped, {e!r}", file=stderr)
+            continue
+
+        if not isinstance(content, str) or not MIN_LENGTH <= len(content) <= MAX_LENGTH:
+            print(f"line {number}: skipped, content must be {MIN_LENGTH}-{MAX_LENGTH} characters", file=stderr)
+            continue
+
+        yield number, author_id, content, reference and int(reference), bool(data.get("hide", False))
+
+
+def batched(rows: Iterable, size: int) -> Iterator[List]:
+    batch = []
+
+    for row in rows:
+        batch.append(row)
+
+        if len(batch) == size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+async def ingest(db: Database, ids: IDGenerator, lines: Iterable[str], batch_size: int) -> int:
+    """Copy validated Moots into the database in batches.
+
+    Args:
+        db (Database): The connected database.
+        ids (IDGenerator): The generator to allocate Moot IDs from.
+        lines (Iterable[str]): The JSONL lines to import.
+        batch_size (int): The number of Moots to copy per batch.
+
+    Returns:
+        int: The number of Moots imported.
+    """
+
+    total = 0
+    started = perf_counter()
+
+    for batch in batched(parse(lines), batch_size):
+        batch_started = perf_counter()
+
+        # IDs from a worker ID whose lock was lost could collide with another process's.
+        if db.worker_lock and not await db.holds_worker_id(ids.worker):
+            raise RuntimeError(f"Lost the lock on snowflake worker ID {ids.worker}, stopping after {total} moots.")
+
+        records = [
+            (id, author_id, content, reference, hide)
+            for id, (_, author_id, content, reference, hide) in zip(ids.next_many(len(batch)), batch)
+        ]
+        await db.bulk_create_moots(records)
+
+        elapsed = perf_counter() - batch_started
+        total += len(records)
+
+        print(f"lines {batch[0][0]}-{batch[-1][0]}: {len(records)} moots in {elapsed:.2f}s ({len(records) / elapsed:,.0f}/s)")
+
+    elapsed = perf_counter() - started
+    print(f"imported {total} moots in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f}/s)")
+
+    return total
+
+
+async def main() -> None:
+    parser = ArgumentParser(description="Bulk import Moots from a JSONL file.")
+    parser.add_argument("path", help="The JSONL file to import.")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Moots to copy per batch.")
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    db = Database()
+    await db.ainit()
+
+    ids = IDGenerator(await db.claim_worker_id(MAX_WORKER + 1))
+
+    try:
+        with open(args.path, encoding="utf-8") as f:
+            await ingest(db, ids, f, args.batch_size)
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    run(main())
@@ -0,0 +1,112 @@
+from os import getenv
+from logging import getLogger
+from asyncio import Event, Task, CancelledError, TimeoutError, get_running_loop, wait_for
+from typing import Optional
+
+from .ids import IDGenerator, MAX_WORKER
+
+
+log = getLogger(__name__)
+
+
+class WorkerLease:
+    """Keeps an IDGenerator's worker ID reserved in the database, watching the lock that reserves it.
+
+    The ID is reserved by an advisory lock on a dedicated connection. If that
+    connection drops, the lock is released and another process may claim the ID,
+    so the generator stops issuing IDs straight away. It resumes once an ID has
+    been claimed again, preferring the one it held before.
+
+    A pinned ID is claimed the same way, but never swapped for another, so two
+    processes started with the same pinned ID can't both issue IDs from it.
+    """
+
+    def __init__(self, db, ids: IDGenerator, count: int, interval: float, pinned: Optional[int] = None) -> None:
+        self.db = db
+        self.ids = ids
+        self.count = count
+        self.interval = interval
+        self.pinned = pinned
+
+        self.held: Optional[int] = None
+        self.losses = 0
+
+        self._wake = Event()
+        self._task: Optional[Task] = None
+
+    @classmethod
+    def from_env(cls, db, ids: IDGenerator) -> "WorkerLease":
+        """Build the lease for a server process, pinned to WORKER_ID if it is set."""
+
+        pinned = getenv("WORKER_ID")
+
+        return cls(db, ids, MAX_WORKER + 1, float(getenv("WORKER_CHECK_INTERVAL", 5)), None if pinned is None else int(pinned))
+
+    async def start(self) -> None:
+        """Claim a worker ID for the generator and start watching it in the background."""
+
+        if self._task:
+            return
+
+        # Nothing may be issued until the ID is actually reserved.
+        self.ids.worker = None
+        self.held = await self._claim(self.pinned)
+        self.ids.worker = self.held
+        self._task = get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop watching the worker ID, waiting for the background task to finish."""
+
+        if self._task:
+            self._task.cancel()
+
+            try:
+                await self._task
+            except CancelledError:
+                pass
+
+            self._task = None
+
+    async def check(self) -> None:
+        """Check the worker ID is still reserved, claiming one again if it isn't."""
+
+        if self.held is not None and await self.db.holds_worker_id(self.held):
+            return
+
+        if self.ids.worker is not None:
+            self._lost()
+
+        self.held = await self._claim(self.held)
+        self.ids.worker = self.held
+
+        log.warning("Reclaimed snowflake worker ID %d", self.held)
+
+    async def _claim(self, preferred: Optional[int]) -> int:
+        return await self.db.claim_worker_id(self.count, preferred, self._lost, fallback=self.pinned is None)
+
+    def _lost(self) -> None:
+        if self.ids.worker is None:
+            return
+
+        self.ids.worker = None
+        self.losses += 1
+        self._wake.set()
+
+        log.warning("Lost the lock on snowflake worker ID %s, no IDs will be issued until it is reclaimed", self.held)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await wait_for(self._wake.wait(), self.interval)
+            except TimeoutError:
+                pass
+
+            self._wake.clear()
+
+            try:
+                await self.check()
+            except CancelledError:
+                raise
+            except Exception:
+                self._lost()
+                log.exception("Snowflake worker ID check failed")
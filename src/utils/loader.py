@@ -0,0 +1,92 @@
+from asyncio import Future, get_running_loop, shield
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .cache import TTLCache
+from .datamodels import User
+
+
+class UserLoader:
+    """Batches user lookups made in the same event loop tick into a single query.
+
+    Loaded users are kept in a bounded LRU cache, which must be cleared for a user
+    whenever their row changes.
+    """
+
+    def __init__(self, fetch: Callable[[List[int]], Awaitable[List[User]]], cache: TTLCache) -> None:
+        self.fetch = fetch
+        self.cache = cache
+
+        self._pending: Dict[int, Future] = {}
+        self._generation = 0
+
+    async def load(self, id: int) -> Optional[User]:
+        """Load a user, joining the batch for the current tick on a cache miss.
+
+        Args:
+            id (int): The ID of the user to load.
+
+        Returns:
+            Optional[User]: The user object.
+        """
+
+        user = self.cache.get(id)
+
+        if user is not None:
+            return user
+
+        future = self._pending.get(id)
+
+        if future is None:
+            loop = get_running_loop()
+
+            if not self._pending:
+                loop.call_soon(self._dispatch)
+
+            future = self._pending[id] = loop.create_future()
+
+        return await shield(future)
+
+    def prime(self, user: User) -> None:
+        """Cache a user which was loaded by another query.
+
+        Args:
+            user (User): The user to cache.
+        """
+
+        self.cache.set(user.id, user)
+
+    def clear(self, id: int) -> None:
+        """Drop a user from the cache after their row changed.
+
+        Args:
+            id (int): The ID of the user to drop.
+        """
+
+        self._generation += 1
+        self.cache.pop(id)
+
+    def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+
+        get_running_loop().create_task(self._load_batch(pending, self._generation))
+
+    async def _load_batch(self, pending: Dict[int, Future], generation: int) -> None:
+        try:
+            users = await self.fetch(list(pending))
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        users = {user.id: user for user in users}
+
+        for id, future in pending.items():
+            user = users.get(id)
+
+            # Anything cleared while the query was in flight may have been read stale.
+            if user and generation == self._generation:
+                self.cache.set(id, user)
+
+            if not future.done():
+                future.set_result(user)
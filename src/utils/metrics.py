@@ -0,0 +1,262 @@
+from bisect import bisect_left
+from time import perf_counter
+from functools import wraps
+from contextvars import ContextVar
+from collections import defaultdict
+from inspect import iscoroutinefunction
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from asyncpg import Connection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+Labels = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 10, 15, 20, 50)
+
+# The number of database round trips made while handling the current request.
+db_calls: ContextVar = ContextVar("db_calls", default=None)
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+
+    return "{" + ",".join(f'{key}="{str(value)}"' for key, value in labels) + "}"
+
+
+class Counter:
+    """A monotonically increasing count, per label set."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+
+        self.values: Dict[Labels, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        self.values[tuple(labels.items())] += amount
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{format_labels(labels)} {value}"
+
+
+class Histogram:
+    """A distribution of observations in cumulative buckets, per label set."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+
+        self.counts: Dict[Labels, List[int]] = {}
+        self.sums: Dict[Labels, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels.items())
+        counts = self.counts.get(key)
+
+        if counts is None:
+            counts = self.counts[key] = [0] * (len(self.buckets) + 1)
+
+        counts[bisect_left(self.buckets, value)] += 1
+        self.sums[key] += value
+
+    def samples(self) -> Iterator[str]:
+        for labels, counts in self.counts.items():
+            total = 0
+
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                total += count
+                yield f"{self.name}_bucket{format_labels(labels + (('le', bound),))} {total}"
+
+            yield f"{self.name}_count{format_labels(labels)} {total}"
+            yield f"{self.name}_sum{format_labels(labels)} {self.sums[labels]}"
+
+
+class Gauge:
+    """A value read when metrics are collected, per label set.
+
+    Counts kept elsewhere can be exposed as counters by passing type="counter".
+    """
+
+    def __init__(self, name: str, help: str, read: Callable[[], Dict[Labels, float]], type: str = "gauge") -> None:
+        self.name = name
+        self.help = help
+        self.read = read
+        self.type = type
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.read().items():
+            yield f"{self.name}{format_labels(labels)} {value}"
+
+
+class Metrics:
+    """A registry of metrics, rendered in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self.register(Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, buckets))
+
+    def gauge(self, name: str, help: str, read: Callable[[], Dict[Labels, float]], type: str = "gauge") -> Gauge:
+        return self.register(Gauge(name, help, read, type))
+
+    def render(self) -> str:
+        lines = []
+
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+
+        return "\n".join(lines) + "\n"
+
+
+class CountedConnection(Connection):
+    """A connection which counts its queries against the current request.
+
+    Pool query methods and transactions all run through these, so the count is the
+    number of statements sent, and Database methods served from a cache add nothing.
+    """
+
+    def _count(self) -> None:
+        calls = db_calls.get()
+
+        if calls is not None:
+            calls[0] += 1
+
+    async def execute(self, *args, **kwargs):
+        self._count()
+        return await super().execute(*args, **kwargs)
+
+    async def executemany(self, *args, **kwargs):
+        self._count()
+        return await super().executemany(*args, **kwargs)
+
+    async def fetch(self, *args, **kwargs):
+        self._count()
+        return await super().fetch(*args, **kwargs)
+
+    async def fetchval(self, *args, **kwargs):
+        self._count()
+        return await super().fetchval(*args, **kwargs)
+
+    async def fetchrow(self, *args, **kwargs):
+        self._count()
+        return await super().fetchrow(*args, **kwargs)
+
+    async def copy_records_to_table(self, *args, **kwargs):
+        self._count()
+        return await super().copy_records_to_table(*args, **kwargs)
+
+
+def instrument_database(db, metrics: Metrics) -> None:
+    """Time every public coroutine method of a database, and count its queries per request.
+
+    Must be called before the database is initialised, so its pools are created with
+    CountedConnection.
+
+    Args:
+        db (Database): The database to instrument, in place.
+        metrics (Metrics): The registry to record timings in.
+    """
+
+    timings = metrics.histogram("moot_db_query_seconds", "Time spent in each Database method.")
+    errors = metrics.counter("moot_db_query_errors_total", "Database method calls which raised.")
+
+    def timed(name: str, method: Callable) -> Callable:
+        @wraps(method)
+        async def wrapper(*args, **kwargs):
+            started = perf_counter()
+
+            try:
+                return await method(*args, **kwargs)
+            except Exception:
+                errors.inc(query=name)
+                raise
+            finally:
+                timings.observe(perf_counter() - started, query=name)
+
+        return wrapper
+
+    db.connection_class = db.replicas.connection_class = CountedConnection
+
+    for name in dir(type(db)):
+        if not name.startswith("_") and iscoroutinefunction(getattr(type(db), name)) and name != "ainit":
+            setattr(db, name, timed(name, getattr(db, name)))
+
+
+class InstrumentMiddleware:
+    """Time each HTTP request until the last chunk of its body is sent, and count its database queries.
+
+    Starlette's http middleware gets the response back as soon as it starts, so it
+    would miss the time spent rendering a streamed template.
+    """
+
+    def __init__(self, app: ASGIApp, observe: Callable[[Scope, int, float, int], None]) -> None:
+        self.app = app
+        self.observe = observe
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        calls = [0]
+        token = db_calls.set(calls)
+        started = perf_counter()
+        status = 500
+        finished = False
+
+        def finish() -> None:
+            nonlocal finished
+
+            if not finished:
+                finished = True
+                self.observe(scope, status, perf_counter() - started, calls[0])
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+            await send(message)
+
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            db_calls.reset(token)
+            finish()
+
+
+def route_paths(app) -> Dict[object, str]:
+    """Map each route's endpoint to its path template, used as a low-cardinality route label."""
+
+    paths = {}
+
+    for route in app.routes:
+        endpoint = getattr(route, "endpoint", None) or getattr(route, "app", None)
+
+        if endpoint is not None:
+            paths[endpoint] = route.path
+
+    return paths
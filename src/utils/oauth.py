@@ -1,6 +1,8 @@
 from os import getenv
+from time import monotonic
+from asyncio import TimeoutError
 
-from aiohttp import ClientSession
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
 from fastapi.exceptions import HTTPException
 
 
@@ -17,13 +19,115 @@ def build_oauth_token_request(code: str) -> tuple:
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
     return query, headers
 
-async def get_user_details(session: ClientSession, code: str) -> dict:
-    try:
+
+class CircuitBreaker:
+    """Stops calls to a failing service for a while after repeated failures."""
+
+    def __init__(self, threshold: int, reset: float) -> None:
+        self.threshold = threshold
+        self.reset = reset
+
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def open(self) -> bool:
+        # Once the reset time has passed a trial call is let through (half open).
+        return self.opened_at is not None and monotonic() - self.opened_at < self.reset
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def failure(self) -> None:
+        self.failures += 1
+
+        if self.failures >= self.threshold:
+            self.opened_at = monotonic()
+
+
+class OAuthClient:
+    """A pooled HTTP client for the Discord OAuth flow.
+
+    The session must be created with `start` inside the running event loop, and
+    closed with `close` on shutdown.
+    """
+
+    def __init__(self) -> None:
+        self.base_url = getenv("DISCORD_API_URL", "https://discord.com/api")
+        self.timeout = ClientTimeout(
+            total=float(getenv("OAUTH_TIMEOUT", 10)),
+            connect=float(getenv("OAUTH_CONNECT_TIMEOUT", 3)),
+        )
+        self.breaker = CircuitBreaker(
+            int(getenv("OAUTH_BREAKER_THRESHOLD", 5)),
+            float(getenv("OAUTH_BREAKER_RESET", 30)),
+        )
+
+        self.session: ClientSession = None
+
+    async def start(self) -> None:
+        """Create the client session and its connection pool."""
+
+        connector = TCPConnector(
+            limit=int(getenv("OAUTH_CONNECTIONS", 20)),
+            ttl_dns_cache=300,
+            keepalive_timeout=30,
+        )
+
+        self.session = ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self) -> None:
+        """Close the client session."""
+
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def _request(self, method: str, path: str, retries: int = 0, **kwargs) -> dict:
+        if self.breaker.open:
+            raise HTTPException(503, "Discord is unavailable, please try again later.")
+
+        for attempt in range(retries + 1):
+            try:
+                async with self.session.request(method, self.base_url + path, **kwargs) as response:
+                    if response.status >= 500:
+                        raise ClientError(f"Discord responded with {response.status}")
+
+                    data = await response.json()
+            except (ClientError, TimeoutError):
+                if attempt < retries:
+                    continue
+
+                self.breaker.failure()
+                raise HTTPException(503, "Discord is unavailable, please try again later.")
+
+            self.breaker.success()
+            return data
+
+    async def get_user_details(self, code: str) -> dict:
+        """Exchange an OAuth code for the Discord user it was granted by.
+
+        Args:
+            code (str): The OAuth code from the callback.
+
+        Returns:
+            dict: The Discord user object.
+        """
+
         token_params, token_headers = build_oauth_token_request(code)
-        token = await (await session.post("https://discord.com/api/oauth2/token", data=token_params, headers=token_headers)).json()
-        auth_header = {"Authorization": f"Bearer {token['access_token']}"}
-        user = await (await session.get("https://discord.com/api/users/@me", headers=auth_header)).json()
-    except KeyError as e:
-        raise HTTPException(401, "Unknown error while creating token")
 
-    return user
+        # Codes are single use, so only the idempotent user lookup is retried.
+        token = await self._request("POST", "/oauth2/token", data=token_params, headers=token_headers)
+
+        try:
+            auth_header = {"Authorization": f"Bearer {token['access_token']}"}
+        except KeyError:
+            raise HTTPException(401, "Unknown error while creating token")
+
+        user = await self._request("GET", "/users/@me", retries=1, headers=auth_header)
+
+        if "id" not in user:
+            raise HTTPException(401, "Unknown error while fetching user")
+
+        return user
@@ -0,0 +1,108 @@
+from os import getenv
+from asyncio import Task, ensure_future, shield
+from typing import Dict, Optional
+
+from fastapi.templating import Jinja2Templates
+
+from .cache import TTLCache
+
+
+HOME_DESCRIPTION = "A social media platform with a twist: a minimum post length!"
+
+
+class OpenGraph:
+    """Rendered Open Graph embeds for link unfurling crawlers.
+
+    Embeds are cached per Moot, and Moots which don't exist for a shorter time.
+    Concurrent requests for an uncached Moot share a single load.
+    """
+
+    def __init__(self, templates: Jinja2Templates) -> None:
+        self.templates = templates
+
+        self._cache: Optional[TTLCache] = None
+        self._home: Optional[str] = None
+        self._inflight: Dict[int, Task] = {}
+
+    @property
+    def cache(self) -> TTLCache:
+        # Built on first use rather than at import, which happens before main.py loads .env.
+        if self._cache is None:
+            self._cache = TTLCache(
+                int(getenv("OG_CACHE_SIZE", 1024)),
+                float(getenv("OG_CACHE_TTL", 300)),
+            )
+
+        return self._cache
+
+    @property
+    def miss_ttl(self) -> float:
+        return float(getenv("OG_MISS_TTL", 30))
+
+    def render(self, desc: str, image: str) -> str:
+        return self.templates.get_template("og.html").render(desc=desc, image=image)
+
+    def home(self) -> str:
+        """Get the embed for the home page."""
+
+        if self._home is None:
+            self._home = self.render(HOME_DESCRIPTION, getenv("BASE_URL") + "/static/images/moot.png")
+
+        return self._home
+
+    async def moot(self, db, id: int) -> Optional[str]:
+        """Get the embed for a Moot.
+
+        Args:
+            db (Database): The database to load uncached Moots from.
+            id (int): The ID of the Moot.
+
+        Returns:
+            Optional[str]: The rendered embed, or None if the Moot doesn't exist.
+        """
+
+        embed = self.cache.get(id)
+
+        if embed is None:
+            load = self._inflight.get(id)
+
+            if load is None:
+                # The load runs in its own task, so a crawler disconnecting part way
+                # through cancels only its own wait, not the query the others share.
+                load = self._inflight[id] = ensure_future(self._load(db, id))
+                load.add_done_callback(lambda _: self._finish(id, load))
+
+            embed = await shield(load)
+
+        return embed or None
+
+    def _finish(self, id: int, load: Task) -> None:
+        del self._inflight[id]
+
+        # Every waiter may have been cancelled, so mark a failure as retrieved.
+        if not load.cancelled():
+            load.exception()
+
+    async def _load(self, db, id: int) -> str:
+        # Embeds are shared by every crawler request, so they are read from the primary:
+        # a lagging replica could re-cache a Moot that was just hidden or evicted.
+        result = await db.get_moot_with_author(id, primary=True)
+
+        if result:
+            moot, user = result
+            embed = self.render(moot._content[:140] + "...", user.avatar_url)
+            self.cache.set(id, embed)
+        else:
+            embed = ""
+            self.cache.set(id, embed, self.miss_ttl)
+
+        return embed
+
+    def evict(self, id: int) -> None:
+        """Drop a Moot's cached embed after it was hidden or deleted.
+
+        Args:
+            id (int): The ID of the Moot.
+        """
+
+        self.cache.pop(id)
@@ -0,0 +1,54 @@
+from math import ceil
+from time import monotonic
+from typing import Hashable
+
+from fastapi.exceptions import HTTPException
+
+from .cache import TTLCache
+
+
+class RateLimiter:
+    """A token bucket per key, refilling at `rate` tokens a second up to `burst` tokens."""
+
+    def __init__(self, rate: float, burst: int, size: int) -> None:
+        self.rate = rate
+        self.burst = burst
+
+        # A bucket left alone long enough to refill is the same as a new one, so
+        # buckets only need to be kept for that long.
+        self.buckets = TTLCache(size, burst / rate)
+        self.limited = 0
+
+    def acquire(self, key: Hashable) -> float:
+        """Take a token from a key's bucket.
+
+        Args:
+            key (Hashable): The key to rate limit by.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until one is available.
+        """
+
+        now = monotonic()
+        tokens, last = self.buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+        if tokens < 1:
+            self.buckets.set(key, (tokens, now))
+            self.limited += 1
+            return (1 - tokens) / self.rate
+
+        self.buckets.set(key, (tokens - 1, now))
+        return 0
+
+    def hit(self, key: Hashable) -> None:
+        """Take a token from a key's bucket, raising a 429 if it is empty.
+
+        Args:
+            key (Hashable): The key to rate limit by.
+        """
+
+        retry_after = self.acquire(key)
+
+        if retry_after:
+            raise HTTPException(429, "You're doing that too often.", headers={"Retry-After": str(ceil(retry_after))})
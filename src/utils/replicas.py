@@ -0,0 +1,121 @@
+from logging import getLogger
+from itertools import count
+from asyncio import Task, CancelledError, get_running_loop, sleep, wait_for
+from typing import Dict, List, Optional, Type
+
+from asyncpg import create_pool, Connection, Pool
+
+
+log = getLogger(__name__)
+
+
+class ReplicaSet:
+    """Read replica pools, health checked in the background and handed out round robin."""
+
+    def __init__(self, dsns: List[str], interval: float, timeout: float, max_lag: float) -> None:
+        self.dsns = dsns
+        self.interval = interval
+        self.timeout = timeout
+        self.max_lag = max_lag
+        self.connection_class: Type[Connection] = Connection
+
+        self.pools: Dict[str, Optional[Pool]] = {dsn: None for dsn in dsns}
+        self.healthy: List[Pool] = []
+        self.checks = 0
+        self.failures = 0
+
+        self._turn = count()
+        self._task: Optional[Task] = None
+
+    def __len__(self) -> int:
+        return len(self.dsns)
+
+    async def start(self) -> None:
+        """Connect to every replica and start health checking them in the background."""
+
+        if not self.dsns or self._task:
+            return
+
+        await self.check()
+        self._task = get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop health checking and close every replica pool."""
+
+        if self._task:
+            self._task.cancel()
+
+            try:
+                await self._task
+            except CancelledError:
+                pass
+
+            self._task = None
+
+        for dsn, pool in self.pools.items():
+            if pool:
+                await pool.close()
+            self.pools[dsn] = None
+
+        self.healthy = []
+
+    def choose(self) -> Optional[Pool]:
+        """Get the next healthy replica pool.
+
+        Returns:
+            Optional[Pool]: A replica pool, or None when no replica is healthy.
+        """
+
+        healthy = self.healthy
+
+        if not healthy:
+            return None
+
+        return healthy[next(self._turn) % len(healthy)]
+
+    async def check(self) -> None:
+        """Check every replica, connecting any that are missing, and update the healthy set."""
+
+        healthy = []
+
+        for dsn in self.dsns:
+            if await self._check(dsn):
+                healthy.append(self.pools[dsn])
+
+        self.checks += 1
+        self.healthy = healthy
+
+    async def _check(self, dsn: str) -> bool:
+        try:
+            if not self.pools[dsn]:
+                self.pools[dsn] = await wait_for(create_pool(dsn, connection_class=self.connection_class), self.timeout)
+
+            # An idle replica that has replayed everything it received is not lagging,
+            # however old its last replayed transaction is.
+            lag = await wait_for(self.pools[dsn].fetchval(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END::float8;"
+            ), self.timeout)
+        except CancelledError:
+            raise
+        except Exception as error:
+            self.failures += 1
+            log.warning("Read replica %s failed its health check: %r", dsn.rsplit("@", 1)[-1], error)
+            return False
+
+        if lag > self.max_lag:
+            log.warning("Read replica %s is %.1fs behind, skipping it", dsn.rsplit("@", 1)[-1], lag)
+            return False
+
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await sleep(self.interval)
+
+            try:
+                await self.check()
+            except CancelledError:
+                raise
+            except Exception:
+                log.exception("Read replica health check failed")
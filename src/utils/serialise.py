@@ -0,0 +1,25 @@
+import json
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Serialise content to compact UTF-8 JSON, using orjson when it is installed."""
+
+    if orjson:
+        return orjson.dumps(content)
+
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """A JSON response serialised with orjson when available, falling back to the json module."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,154 @@
+"""Content-hashed, precompressed static files.
+
+    python -m src.utils.static [directory]
+
+writes gzip (and brotli, if installed) variants of every compressible file next
+to the original, to be served to clients which accept them.
+"""
+
+import os
+import gzip
+from sys import argv
+from hashlib import sha256
+from mimetypes import guess_type
+from typing import Dict, Iterator
+
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+COMPRESSIBLE = (".css", ".js", ".map", ".svg", ".html", ".txt", ".json")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+
+
+def walk(directory: str) -> Iterator[str]:
+    """Yield the relative paths of the files in a directory, skipping compressed variants."""
+
+    for root, _, files in sorted(os.walk(directory)):
+        for name in sorted(files):
+            if not name.endswith(tuple(COMPRESSED_SUFFIXES.values())):
+                yield os.path.relpath(os.path.join(root, name), directory)
+
+
+def file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return sha256(f.read()).hexdigest()[:12]
+
+
+def directory_digest(*directories: str) -> str:
+    """Hash the contents of every file in some directories."""
+
+    digest = sha256()
+
+    for directory in directories:
+        for path in walk(directory):
+            digest.update(path.encode() + file_hash(os.path.join(directory, path)).encode())
+
+    return digest.hexdigest()[:12]
+
+
+class HashedStaticFiles(StaticFiles):
+    """Static files served under content-hashed URLs, with precompressed variants.
+
+    URLs built with `url` carry the file's hash and are cached for a year, since a
+    new deploy changing the file changes its URL. Other requests must revalidate.
+    """
+
+    def __init__(self, *, directory: str, prefix: str = "/static") -> None:
+        super().__init__(directory=directory)
+
+        self.prefix = prefix
+        self.hashes: Dict[str, str] = {
+            path.replace(os.sep, "/"): file_hash(os.path.join(directory, path)) for path in walk(directory)
+        }
+
+    def url(self, path: str) -> str:
+        """Get the content-hashed URL of a static file.
+
+        Args:
+            path (str): The file's path within the static directory.
+
+        Returns:
+            str: The URL to link to the file with.
+        """
+
+        version = self.hashes.get(path)
+
+        if version is None:
+            return f"{self.prefix}/{path}"
+
+        return f"{self.prefix}/{path}?v={version}"
+
+    def file_response(self, full_path: str, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        accepted = request_headers.get("accept-encoding", "")
+
+        relative = os.path.relpath(full_path, os.path.realpath(self.directory)).replace(os.sep, "/")
+        version = QueryParams(scope.get("query_string", b"")).get("v")
+
+        headers = {
+            "Cache-Control": IMMUTABLE if version and version == self.hashes.get(relative) else REVALIDATE,
+        }
+        path, encoding = full_path, None
+
+        if full_path.endswith(COMPRESSIBLE):
+            headers["Vary"] = "Accept-Encoding"
+
+            for name, suffix in COMPRESSED_SUFFIXES.items():
+                if name in accepted and os.path.isfile(full_path + suffix):
+                    path, encoding = full_path + suffix, name
+                    break
+
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            stat_result = os.stat(path)
+
+        response = FileResponse(
+            path,
+            status_code=status_code,
+            headers=headers,
+            media_type=guess_type(full_path)[0] or "text/plain",
+            stat_result=stat_result,
+            method=scope["method"],
+        )
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+
+        return response
+
+
+def precompress(directory: str) -> None:
+    """Write gzip and brotli variants of every compressible file in a directory."""
+
+    for path in walk(directory):
+        if not path.endswith(COMPRESSIBLE):
+            continue
+
+        full_path = os.path.join(directory, path)
+
+        with open(full_path, "rb") as f:
+            data = f.read()
+
+        with open(full_path + ".gz", "wb") as f:
+            f.write(gzip.compress(data, 9, mtime=0))
+
+        if brotli:
+            with open(full_path + ".br", "wb") as f:
+                f.write(brotli.compress(data, quality=11))
+
+        print(f"compressed {path}")
+
+
+if __name__ == "__main__":
+    precompress(argv[1] if len(argv) > 1 else "static")
@@ -0,0 +1,39 @@
+from typing import AsyncIterator
+
+from jinja2 import Template
+from starlette.responses import StreamingResponse
+
+
+CHUNK_SIZE = 16 * 1024
+
+
+async def render_chunks(template: Template, context: dict) -> AsyncIterator[str]:
+    """Render a template, yielding its output in chunks of roughly CHUNK_SIZE characters."""
+
+    buffer = []
+    size = 0
+
+    for part in template.generate(context):
+        buffer.append(part)
+        size += len(part)
+
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+
+    if buffer:
+        yield "".join(buffer)
+
+
+class TemplateStream(StreamingResponse):
+    """A template response sent as it renders, rather than once fully rendered.
+
+    The status and headers are sent before rendering starts, so a template error
+    part way through cuts the response short instead of becoming a 500.
+    """
+
+    media_type = "text/html"
+
+    def __init__(self, template: Template, context: dict, status_code: int = 200, headers: dict = None) -> None:
+        super().__init__(render_chunks(template, context), status_code, headers)
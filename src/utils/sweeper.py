@@ -0,0 +1,74 @@
+from logging import getLogger
+from datetime import datetime
+from asyncio import Task, CancelledError, get_running_loop, sleep
+from typing import Awaitable, Callable, Optional
+
+
+log = getLogger(__name__)
+
+
+class Sweeper:
+    """Runs a cleanup job in the background on an interval, counting the rows it reclaims."""
+
+    def __init__(self, name: str, sweep: Callable[[], Awaitable[int]], interval: float) -> None:
+        self.name = name
+        self.sweep = sweep
+        self.interval = interval
+
+        self.runs = 0
+        self.failures = 0
+        self.reclaimed = 0
+        self.last_reclaimed = 0
+        self.last_run: Optional[datetime] = None
+
+        self._task: Optional[Task] = None
+
+    def start(self) -> None:
+        """Start sweeping in the background."""
+
+        if not self._task:
+            self._task = get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop sweeping, waiting for the background task to finish."""
+
+        if self._task:
+            self._task.cancel()
+
+            try:
+                await self._task
+            except CancelledError:
+                pass
+
+            self._task = None
+
+    async def run_once(self) -> int:
+        """Run a single sweep.
+
+        Returns:
+            int: The number of rows reclaimed.
+        """
+
+        reclaimed = await self.sweep()
+
+        self.runs += 1
+        self.reclaimed += reclaimed
+        self.last_reclaimed = reclaimed
+        self.last_run = datetime.utcnow()
+
+        if reclaimed:
+            log.info("%s sweep reclaimed %d rows", self.name, reclaimed)
+
+        return reclaimed
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except CancelledError:
+                raise
+            except Exception:
+                self.failures += 1
+                log.exception("%s sweep failed", self.name)
+
+            await sleep(self.interval)